@@ -0,0 +1,295 @@
+'''Encoding and loading of the ABI bundle produced by generate_abi.py
+
+Formats:
+    json      - indented JSON with sorted keys, the default output
+    compact   - canonical JSON: sorted keys and no whitespace
+    gzip      - compact JSON compressed with gzip
+    zstd      - compact JSON compressed with zstd, requires zstandard package
+    msgpack   - MessagePack with sorted keys, requires msgpack package
+    cbor      - canonical CBOR, requires cbor2 package
+    indexed   - compact JSON of every key stored separately after a header with their byte offsets,
+                IndexedBundle reads single contracts from it without decoding the rest
+
+Any format can hold a deduplicated bundle where every <name>_abi is a list of keys
+of fragments stored once in abi_fragments. load() expands it back by default.
+
+abi_selectors maps function and error selectors and event topic hashes
+to lists of [contract, position of the fragment in <contract>_abi].
+'''
+
+# cspell:words cbor zstd zstandard msgpack packb unpackb mmap SKLABI
+
+import gzip
+import json
+import mmap
+from collections.abc import Mapping
+
+FORMATS = ['json', 'compact', 'gzip', 'zstd', 'msgpack', 'cbor', 'indexed']
+FRAGMENTS_KEY = 'abi_fragments'
+SELECTORS_KEY = 'abi_selectors'
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Indexed format: magic, 4 bytes big endian header length, header JSON {key: [offset, length]}, values
+_INDEXED_MAGIC = b'SKLABI1\n'
+_INDEXED_HEADER_START = len(_INDEXED_MAGIC) + 4
+
+
+def dump(bundle, output_format='json'):
+    '''Returns bundle encoded in output_format as bytes'''
+    if output_format == 'json':
+        return (json.dumps(bundle, sort_keys=True, indent=4) + '\n').encode()
+    if output_format == 'compact':
+        return _dump_compact(bundle)
+    if output_format == 'gzip':
+        return gzip.compress(_dump_compact(bundle), mtime=0)
+    if output_format == 'zstd':
+        zstandard = _import_optional('zstandard', output_format)
+        return zstandard.ZstdCompressor(level=19).compress(_dump_compact(bundle))
+    if output_format == 'msgpack':
+        msgpack = _import_optional('msgpack', output_format)
+        return msgpack.packb(_sort_keys(bundle))
+    if output_format == 'cbor':
+        cbor2 = _import_optional('cbor2', output_format)
+        return cbor2.dumps(bundle, canonical=True)
+    if output_format == 'indexed':
+        return _dump_indexed(bundle)
+    raise ValueError(f'Unknown ABI bundle format {output_format}')
+
+
+def load(data, input_format=None, expand_fragments=True):
+    '''Decodes bundle from bytes, detecting the format by its first bytes if input_format is not set'''
+    bundle = _decode(data, input_format)
+    if expand_fragments and FRAGMENTS_KEY in bundle:
+        return expand(bundle)
+    return bundle
+
+
+def _decode(data, input_format):
+    if input_format is None:
+        input_format = detect_format(data)
+    if input_format in ('json', 'compact'):
+        return json.loads(data)
+    if input_format == 'gzip':
+        return json.loads(gzip.decompress(data))
+    if input_format == 'zstd':
+        zstandard = _import_optional('zstandard', input_format)
+        return json.loads(zstandard.ZstdDecompressor().decompress(data))
+    if input_format == 'msgpack':
+        msgpack = _import_optional('msgpack', input_format)
+        return msgpack.unpackb(data)
+    if input_format == 'cbor':
+        cbor2 = _import_optional('cbor2', input_format)
+        return cbor2.loads(data)
+    if input_format == 'indexed':
+        header, start = _load_indexed_header(data)
+        return {key: json.loads(data[start + offset:start + offset + length])
+                for key, (offset, length) in header.items()}
+    raise ValueError(f'Unknown ABI bundle format {input_format}')
+
+
+def load_file(filename, input_format=None, expand_fragments=True):
+    with open(filename, 'rb') as bundle_file:
+        return load(bundle_file.read(), input_format, expand_fragments)
+
+
+class IndexedBundle(Mapping):
+    '''Read only mapping over a memory mapped bundle in indexed format.
+
+    Only the header is decoded on open, every value is decoded on first access and memoized.
+    ABI of a deduplicated bundle are expanded with fragments, that are decoded once.
+    Keys are the ones load() returns: abi_fragments is hidden as it is expanded, abi_selectors is kept.
+    '''
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as bundle_file:
+            self._data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(_INDEXED_MAGIC)] != _INDEXED_MAGIC:
+            self._data.close()
+            raise ValueError(f'{filename} is not an indexed ABI bundle')
+        self._header, self._start = _load_indexed_header(self._data)
+        self._keys = [key for key in self._header if key != FRAGMENTS_KEY]
+        self._fragments = None
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key == FRAGMENTS_KEY:
+                raise KeyError(key)
+            value = self._decode(key)
+            if key.endswith('_abi') and FRAGMENTS_KEY in self._header:
+                if self._fragments is None:
+                    self._fragments = self._decode(FRAGMENTS_KEY)
+                value = [self._fragments[fragment_key] for fragment_key in value]
+            self._values[key] = value
+        return self._values[key]
+
+    def __contains__(self, key):
+        # checked in the header, the inherited method would decode the value
+        return key in self._header and key != FRAGMENTS_KEY
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_abi(self, contract):
+        return self[contract + '_abi']
+
+    def get_address(self, contract):
+        return self[contract + '_address']
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _decode(self, key):
+        offset, length = self._header[key]
+        return json.loads(self._data[self._start + offset:self._start + offset + length])
+
+
+def get_signature(fragment):
+    name = fragment.get('name', fragment['type'])
+    return name + '(' + ','.join(_get_canonical_type(parameter) for parameter in fragment.get('inputs', [])) + ')'
+
+
+def get_selector(fragment):
+    '''Returns topic hash of an event, 4 bytes selector of a function or an error, and type of other fragments'''
+    if fragment['type'] not in ('function', 'event', 'error'):
+        return fragment['type']
+    from eth_utils import keccak
+
+    digest = keccak(text=get_signature(fragment))
+    return '0x' + (digest if fragment['type'] == 'event' else digest[:4]).hex()
+
+
+def add_selector_index(bundle):
+    '''Returns bundle with abi_selectors index of all functions, events and errors'''
+    index = {}
+    for name in sorted(bundle):
+        if not name.endswith('_abi'):
+            continue
+        contract = name[:-len('_abi')]
+        for position, fragment in enumerate(bundle[name]):
+            if fragment['type'] in ('function', 'event', 'error'):
+                index.setdefault(get_selector(fragment), []).append([contract, position])
+    return {**bundle, SELECTORS_KEY: index}
+
+
+def find_fragments(bundle, selector):
+    '''Returns (contract, fragment) pairs for a selector or a topic hash using abi_selectors index'''
+    return [(contract, bundle[contract + '_abi'][position])
+            for contract, position in bundle[SELECTORS_KEY].get(selector.lower(), [])]
+
+
+def deduplicate(bundle):
+    '''Stores every distinct ABI fragment once in abi_fragments keyed by its selector.
+
+    ABI are replaced with lists of keys. Different fragments with the same selector
+    get a numeric suffix in the order of sorted bundle keys.
+    '''
+    fragments = {}
+    keys = {}
+    result = {}
+    for name in sorted(bundle):
+        if not name.endswith('_abi'):
+            result[name] = bundle[name]
+            continue
+        references = []
+        for fragment in bundle[name]:
+            canonical = json.dumps(fragment, sort_keys=True)
+            if canonical not in keys:
+                selector = get_selector(fragment)
+                key = selector
+                suffix = 0
+                while key in fragments:
+                    suffix += 1
+                    key = f'{selector}-{suffix}'
+                fragments[key] = fragment
+                keys[canonical] = key
+            references.append(keys[canonical])
+        result[name] = references
+    result[FRAGMENTS_KEY] = fragments
+    return result
+
+
+def expand(bundle):
+    '''Restores ABI of a deduplicated bundle. Equal fragments stay shared between contracts.'''
+    fragments = bundle[FRAGMENTS_KEY]
+    result = {}
+    for name, value in bundle.items():
+        if name == FRAGMENTS_KEY:
+            continue
+        if name.endswith('_abi'):
+            value = [fragments[key] for key in value]
+        result[name] = value
+    return result
+
+
+def detect_format(data):
+    if data.startswith(_INDEXED_MAGIC):
+        return 'indexed'
+    if data.startswith(_GZIP_MAGIC):
+        return 'gzip'
+    if data.startswith(_ZSTD_MAGIC):
+        return 'zstd'
+    first = data.lstrip()[:1]
+    if first == b'{':
+        return 'json'
+    if first and (0x80 <= first[0] <= 0x8f or first[0] in (0xde, 0xdf)):
+        return 'msgpack'
+    if first and 0xa0 <= first[0] <= 0xbf:
+        return 'cbor'
+    raise ValueError('Unknown ABI bundle format')
+
+
+def _get_canonical_type(parameter):
+    if not parameter['type'].startswith('tuple'):
+        return parameter['type']
+    components = ','.join(_get_canonical_type(component) for component in parameter['components'])
+    return '(' + components + ')' + parameter['type'][len('tuple'):]
+
+
+def _dump_indexed(bundle):
+    header = {}
+    values = []
+    offset = 0
+    for key in sorted(bundle):
+        value = _dump_compact(bundle[key])
+        header[key] = [offset, len(value)]
+        values.append(value)
+        offset += len(value)
+    encoded_header = _dump_compact(header)
+    return _INDEXED_MAGIC + len(encoded_header).to_bytes(4, 'big') + encoded_header + b''.join(values)
+
+
+def _load_indexed_header(data):
+    '''Returns the header and the position of values in data'''
+    length = int.from_bytes(data[len(_INDEXED_MAGIC):_INDEXED_HEADER_START], 'big')
+    end = _INDEXED_HEADER_START + length
+    return json.loads(data[_INDEXED_HEADER_START:end]), end
+
+
+def _dump_compact(bundle):
+    return json.dumps(bundle, sort_keys=True, separators=(',', ':')).encode()
+
+
+def _sort_keys(value):
+    if isinstance(value, dict):
+        return {key: _sort_keys(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sort_keys(item) for item in value]
+    return value
+
+
+def _import_optional(module, bundle_format):
+    try:
+        return __import__(module)
+    except ImportError:
+        raise ImportError(f'{module} package is required for {bundle_format} format')
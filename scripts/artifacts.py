@@ -0,0 +1,141 @@
+'''Extraction of ABI from hardhat build artifacts'''
+
+import hashlib
+import os
+
+import cache
+import json_stream
+
+DEFAULT_CACHE_DIR = cache.get_cache_dir('abi')
+
+
+def get_artifact_filename(build_dir, name):
+    return build_dir + '/contracts/' + name + '.json'
+
+
+def load_abi(filename):
+    with open(filename) as artifact_file:
+        return json_stream.extract_key(artifact_file, 'abi')
+
+
+def load_abis(filenames, jobs=1, abi_cache=None, threads=False):
+    '''Loads ABI of every artifact using up to `jobs` worker processes or threads.
+
+    Returns a list of (abi, error) pairs in the order of filenames,
+    so a failure of one artifact does not prevent loading of others.
+    '''
+    results = [None] * len(filenames)
+    pending = []
+    for i, filename in enumerate(filenames):
+        abi = abi_cache.lookup(filename) if abi_cache is not None else None
+        if abi is not None:
+            results[i] = (abi, None)
+        else:
+            pending.append(i)
+
+    cache_dir = abi_cache.cache_dir if abi_cache is not None else None
+    pending_filenames = [filenames[i] for i in pending]
+    if jobs > 1 and len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        executor_class = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        with executor_class(max_workers=jobs) as executor:
+            loaded = list(executor.map(_try_read_abi, pending_filenames, [cache_dir] * len(pending)))
+    else:
+        loaded = [_try_read_abi(filename, cache_dir) for filename in pending_filenames]
+
+    for i, (abi, entry, hit, error) in zip(pending, loaded):
+        if error is None and abi_cache is not None:
+            abi_cache.update(filenames[i], entry, hit)
+        results[i] = (abi, error)
+    return results
+
+
+def _try_read_abi(filename, cache_dir):
+    try:
+        return _read_abi(filename, cache_dir) + (None,)
+    except Exception as e:
+        return None, None, False, e
+
+
+def _read_abi(filename, cache_dir):
+    if cache_dir is None:
+        return load_abi(filename), None, False
+
+    stat = os.stat(filename)
+    digest = _hash_file(filename)
+    entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest}
+    abi_filename = _get_abi_filename(cache_dir, digest)
+    abi = cache.load_json(abi_filename, None)
+    if abi is not None:
+        return abi, entry, True
+    abi = load_abi(filename)
+    cache.dump_json_atomically(abi_filename, abi)
+    return abi, entry, False
+
+
+def _hash_file(filename):
+    '''Returns sha256 of the file read in chunks, so the artifact is never held in memory as a whole'''
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as artifact_file:
+        for chunk in iter(lambda: artifact_file.read(json_stream.CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_abi_filename(cache_dir, digest):
+    return os.path.join(cache_dir, digest + '.json')
+
+
+class AbiCache:
+    '''Content addressed store of ABI extracted from artifacts.
+
+    ABI of an artifact is kept in <cache dir>/<sha256 of the artifact>.json.
+    The index maps artifact path to its mtime, size and hash,
+    so artifacts that were not touched since the last run are not even read.
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_filename = os.path.join(cache_dir, 'index.json')
+        self.index = cache.load_json(self.index_filename, {})
+        self.hits = 0
+        self.misses = 0
+        self.changed = False
+
+    def load_abi(self, filename):
+        abi = self.lookup(filename)
+        if abi is None:
+            abi, entry, hit = _read_abi(filename, self.cache_dir)
+            self.update(filename, entry, hit)
+        return abi
+
+    def lookup(self, filename):
+        '''Returns cached ABI if the artifact was not touched since it was cached'''
+        path = os.path.realpath(filename)
+        entry = self.index.get(path)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            return None
+        abi = cache.load_json(_get_abi_filename(self.cache_dir, entry['hash']), None)
+        if abi is not None:
+            self.hits += 1
+        return abi
+
+    def update(self, filename, entry, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.index[os.path.realpath(filename)] = entry
+        self.changed = True
+
+    def save(self):
+        if self.changed:
+            cache.dump_json_atomically(self.index_filename, self.index)
+            self.changed = False
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+'''The script compares streaming ABI extraction with decoding of whole artifacts'''
+
+# cspell:words tracemalloc
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import artifacts
+
+
+def load_abi_fully(filename):
+    with open(filename) as artifact_file:
+        return json.loads(artifact_file.read())['abi']
+
+
+def make_cache_miss_loader(cache_dir):
+    '''Returns a loader going through the ABI cache, which is emptied before every artifact'''
+    def load_abi(filename):
+        for name in os.listdir(cache_dir):
+            os.unlink(os.path.join(cache_dir, name))
+        return artifacts.AbiCache(cache_dir).load_abi(filename)
+    return load_abi
+
+
+def measure(load_abi, filenames, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for filename in filenames:
+            load_abi(filename)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = 0
+    for filename in filenames:
+        tracemalloc.start()
+        load_abi(filename)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('artifacts', nargs='+', help='artifact files, e.g. artifacts/contracts/**/*.json')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for filename in args.artifacts:
+        if load_abi_fully(filename) != artifacts.load_abi(filename):
+            raise ValueError(f'Extracted ABI of {filename} does not match')
+
+    size = sum(os.path.getsize(filename) for filename in args.artifacts)
+    print(f'{len(args.artifacts)} artifacts, {size / 2 ** 20:.1f} MiB')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        loaders = [
+            ('json.loads', load_abi_fully),
+            ('streaming', artifacts.load_abi),
+            ('cache miss', make_cache_miss_loader(cache_dir))
+        ]
+        for title, load_abi in loaders:
+            elapsed, peak = measure(load_abi, args.artifacts, args.repeat)
+            print(f'{title:>10}: {elapsed * 1000:8.1f} ms, peak memory per artifact {peak / 2 ** 10:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+'''The script measures start time of cli.py commands and import time of the script modules'''
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import cli
+
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def measure(arguments, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=SCRIPTS_DIR, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = measure(['-c', 'pass'], args.repeat)
+    print(f'{"interpreter":>40}: {baseline * 1000:6.1f} ms')
+    for arguments in [['cli.py', '--help']] + [['cli.py', command, '--help'] for command in cli.COMMANDS]:
+        elapsed = measure(arguments, args.repeat)
+        print(f'{" ".join(arguments):>40}: {elapsed * 1000:6.1f} ms, {(elapsed - baseline) * 1000:+6.1f} ms')
+    for module in sorted({module for module, _ in cli.COMMANDS.values()}):
+        elapsed = measure(['-c', f'import {module}'], args.repeat)
+        print(f'{"import " + module:>40}: {elapsed * 1000:6.1f} ms, {(elapsed - baseline) * 1000:+6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
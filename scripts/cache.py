@@ -0,0 +1,47 @@
+'''Helpers shared by the scripts that keep data on disk between runs'''
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+
+def get_cache_dir(name):
+    return os.path.join(os.path.expanduser(os.environ.get('XDG_CACHE_HOME', '~/.cache')), 'skale-manager', name)
+
+
+def get_hash(value):
+    '''Returns sha256 of JSON encoded value, it does not depend on order of keys'''
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def load_json(filename, default):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+@contextlib.contextmanager
+def open_atomically(filename, mode='w'):
+    '''Opens a temporary file that replaces filename only if the block completes without errors'''
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        if os.path.exists(filename):
+            shutil.copymode(filename, temporary_filename)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        os.unlink(temporary_filename)
+        raise
+
+
+def dump_json_atomically(filename, data):
+    with open_atomically(filename) as f:
+        json.dump(data, f, separators=(',', ':'))
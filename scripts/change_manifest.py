@@ -1,24 +1,131 @@
 #!/usr/bin/env python
 
-'''The script updates manifest file to fix _initialized type after openzeppelin contracts upgrade'''
+'''The script updates manifest file to fix storage layouts after openzeppelin contracts upgrade'''
 
-import sys
+# cspell:words impls
+
+import argparse
 import json
+import sys
 
+import cache
+import json_stream
 
-def main():
-    manifest_filename = sys.argv[1]
+# Every rule changes fields of storage slots that have exactly the given contract, label and type
+MIGRATIONS = [
+    {
+        'name': 'initialized-uint8',
+        'match': {'contract': 'Initializable', 'label': '_initialized', 'type': 't_bool'},
+        'set': {'type': 't_uint8'}
+    }
+]
+
+
+def get_slot_key(slot):
+    return slot['contract'], slot['label'], slot['type']
+
+
+def get_rule_key(rule):
+    match = rule['match']
+    return match['contract'], match['label'], match['type']
+
+
+def build_slot_index(impls, keys):
+    '''Returns {slot key: [(impl, position)]} for slots whose key is one of keys'''
+    index = {}
+    for impl, data in impls.items():
+        for position, slot in enumerate(data['layout']['storage']):
+            key = get_slot_key(slot)
+            if key in keys:
+                index.setdefault(key, []).append((impl, position))
+    return index
+
+
+def migrate(impls, rules, migrated=None):
+    '''Applies rules to storage layouts of impls in place.
+
+    If `migrated` set is given, impls with slots matching rules are skipped if their storage layout hash
+    is in it, hashes of other such layouts are added to it. Layouts without matching slots are not hashed.
+    Returns a list of (rule name, impl, slot before, slot after) for every changed slot.
+    '''
+    keys = {get_rule_key(rule) for rule in rules}
+    index = build_slot_index(impls, keys)
+    if migrated is not None:
+        matching = {impl for key in keys for impl, _ in index.get(key, [])}
+        skipped = {impl for impl in matching if cache.get_hash(impls[impl]['layout']['storage']) in migrated}
+        for key, entries in index.items():
+            index[key] = [(impl, position) for impl, position in entries if impl not in skipped]
+    changes = []
+    for rule in rules:
+        for impl, position in index.pop(get_rule_key(rule), []):
+            slot = impls[impl]['layout']['storage'][position]
+            before = dict(slot)
+            slot.update(rule['set'])
+            index.setdefault(get_slot_key(slot), []).append((impl, position))
+            changes.append((rule['name'], impl, before, dict(slot)))
+    if migrated is not None:
+        for impl in matching - skipped:
+            migrated.add(cache.get_hash(impls[impl]['layout']['storage']))
+    return changes
+
+
+def change_manifest(manifest_filename, rules, migrated):
     with open(manifest_filename) as f:
         manifest = json.load(f)
-        # cspell:disable-next-line
-        for impl in manifest['impls'].keys():
-            # cspell:disable-next-line
-            storage = manifest['impls'][impl]['layout']['storage']
-            for slot in storage:
-                if slot['contract'] == 'Initializable' and slot['label'] == '_initialized' and slot['type'] == 't_bool':
-                    slot['type'] = 't_uint8'
+    changes = migrate(manifest['impls'], rules, migrated)
     with open(manifest_filename, 'w') as f:
         f.write(json.dumps(manifest, indent=2))
+    return changes
+
+
+def change_manifest_streaming(manifest_filename, rules, migrated):
+    changes = []
+
+    def migrate_impl(path):
+        if len(path) != 2 or path[0] != 'impls':
+            return None
+
+        def transform(data):
+            changes.extend(migrate({path[1]: data}, rules, migrated))
+            return data
+        return transform
+
+    with open(manifest_filename) as input_file, cache.open_atomically(manifest_filename) as output_file:
+        json_stream.rewrite(input_file, output_file, migrate_impl)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('manifest')
+    parser.add_argument('--stream', action='store_true',
+                        help='rewrite the manifest without loading it into memory')
+    parser.add_argument('--rules', help='JSON file with a list of migration rules to apply instead of built-in ones')
+    parser.add_argument('--state', help='file with hashes of already migrated layouts, layouts in it are skipped')
+    args = parser.parse_args()
+
+    rules = MIGRATIONS
+    if args.rules:
+        with open(args.rules) as rules_file:
+            rules = json.load(rules_file)
+    rules_hash = cache.get_hash(rules)
+    state = cache.load_json(args.state, {}) if args.state else {}
+    migrated = set(state.get(rules_hash, [])) if args.state else None
+
+    if args.stream:
+        changes = change_manifest_streaming(args.manifest, rules, migrated)
+    else:
+        changes = change_manifest(args.manifest, rules, migrated)
+
+    for name, impl, before, after in changes:
+        changed = ', '.join(f'{field} {before.get(field)} -> {after[field]}'
+                            for field in after if before.get(field) != after[field])
+        print(f'{name}: {before["contract"]}.{before["label"]} of {impl}: {changed}', file=sys.stderr)
+    print(f'{len(changes)} slots changed', file=sys.stderr)
+    if args.state:
+        state[rules_hash] = sorted(migrated)
+        cache.dump_json_atomically(args.state, state)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+'''The script checks that storage layouts of contracts in the manifest are compatible with a candidate build
+
+Candidate is a hardhat build-info directory or file, or another manifest, e.g. one written by a test deployment.
+Impls are matched with candidate contracts by the last contract in their storage layout.
+'''
+
+# cspell:words impls
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+import json_stream
+import manifest
+
+_GAP_LABEL = re.compile(r'^_+gap$')
+
+
+def is_gap(slot):
+    return _GAP_LABEL.match(slot.label) is not None
+
+
+def load_build_info_layouts(filename, interner):
+    with open(filename) as build_info_file:
+        output = json_stream.extract_key(build_info_file, 'output')
+    layouts = {}
+    for contracts in output.get('contracts', {}).values():
+        for name, contract in contracts.items():
+            storage_layout = contract.get('storageLayout')
+            if storage_layout is None:
+                continue
+            layouts[name] = interner.layout({
+                'storage': [{
+                    'label': slot['label'],
+                    'type': slot['type'],
+                    'contract': slot['contract'].split(':')[-1],
+                    'offset': slot['offset'],
+                    'slot': slot['slot']
+                } for slot in storage_layout['storage']],
+                'types': {
+                    type_name: {
+                        'label': descriptor['label'],
+                        'numberOfBytes': descriptor.get('numberOfBytes')
+                    } for type_name, descriptor in (storage_layout.get('types') or {}).items()
+                }
+            })
+    return layouts
+
+
+def load_candidate_layouts(path, interner):
+    '''Returns dict of candidate layouts by layout key'''
+    if os.path.isdir(path):
+        filenames = sorted(glob.glob(os.path.join(path, '*.json')))
+    else:
+        filenames = [path]
+    by_name = {}
+    for filename in filenames:
+        with open(filename) as candidate_file:
+            # manifestVersion is the first key of manifests while build-info starts with its id and format
+            is_manifest = '"manifestVersion"' in candidate_file.read(256)
+        if is_manifest:
+            candidate = manifest.load(filename, interner)
+            for impl in candidate['impls'].values():
+                by_name[manifest.get_layout_contract(impl['layout'])] = impl['layout']
+        else:
+            by_name.update(load_build_info_layouts(filename, interner))
+
+    candidates = {}
+    for name, layout in by_name.items():
+        key = manifest.get_layout_contract(layout)
+        if key is not None and (key not in candidates or key == name):
+            candidates[key] = layout
+    return candidates
+
+
+def get_slot_count(slot, type_table):
+    descriptor = type_table.get(slot.type)
+    if descriptor is None or descriptor.numberOfBytes is None:
+        return 1
+    return max(1, (int(descriptor.numberOfBytes) + 31) // 32)
+
+
+def get_type_label(slot, type_table):
+    '''Returns label of the slot type, or its id without the t_ prefix if the type has no descriptor'''
+    descriptor = type_table.get(slot.type)
+    if descriptor is not None:
+        return descriptor.label
+    # Layouts retyped by change_manifest.py lack descriptors of elementary types, labels of those are their ids
+    return slot.type[len('t_'):] if slot.type.startswith('t_') else slot.type
+
+
+def compare_layouts(original, candidate):
+    '''Returns a list of (kind, message) for every incompatibility of candidate with original layout'''
+    if original is candidate:
+        return []
+    if manifest.has_positions(original) and manifest.has_positions(candidate):
+        return _compare_positions(original, candidate)
+    return _compare_order(original, candidate)
+
+
+def _compare_positions(original, candidate):
+    original_types = manifest.get_type_table(original.types)
+    candidate_types = manifest.get_type_table(candidate.types)
+    by_position = {}
+    by_name = {}
+    contract_ends = {}
+    for slot in candidate.storage:
+        by_position[(int(slot.slot), slot.offset)] = slot
+        by_name[(slot.contract, slot.label)] = slot
+        if slot.renamedFrom is not None:
+            by_name[(slot.contract, slot.renamedFrom)] = slot
+        end = int(slot.slot) + get_slot_count(slot, candidate_types)
+        contract_ends[slot.contract] = max(end, contract_ends.get(slot.contract, 0))
+
+    issues = []
+    for slot in original.storage:
+        position = (int(slot.slot), slot.offset)
+        name = f'{slot.contract}.{slot.label}'
+        if is_gap(slot):
+            end = position[0] + get_slot_count(slot, original_types)
+            candidate_end = contract_ends.get(slot.contract)
+            if candidate_end is not None and candidate_end < end:
+                issues.append(('gap shrinkage', f'{name} ends at slot {candidate_end} instead of {end}'))
+            elif candidate_end is not None and candidate_end > end:
+                issues.append(('gap growth', f'{name} ends at slot {candidate_end} instead of {end}'))
+            continue
+        match = by_name.get((slot.contract, slot.label))
+        if match is None:
+            occupant = by_position.get(position)
+            if occupant is not None and not is_gap(occupant):
+                issues.append(('collision', f'{name} at slot {position[0]} offset {position[1]} ' +
+                               f'is replaced with {occupant.contract}.{occupant.label}'))
+            else:
+                issues.append(('deleted', f'{name} is deleted'))
+            continue
+        match_position = (int(match.slot), match.offset)
+        if match_position != position:
+            issues.append(('collision', f'{name} moved from slot {position[0]} offset {position[1]} ' +
+                           f'to slot {match_position[0]} offset {match_position[1]}'))
+        original_type = get_type_label(slot, original_types)
+        candidate_type = get_type_label(match, candidate_types)
+        if original_type != candidate_type and match.retypedFrom != original_type:
+            issues.append(('type change', f'{name} type changed from {original_type} to {candidate_type}'))
+    return issues
+
+
+def _compare_order(original, candidate):
+    # Old manifests have no slot positions, so compare order of variables within every contract
+    original_types = manifest.get_type_table(original.types)
+    candidate_types = manifest.get_type_table(candidate.types)
+    original_contracts = _group_by_contract(original)
+    candidate_contracts = _group_by_contract(candidate)
+    issues = []
+    if [c for c in candidate_contracts if c in original_contracts] != list(original_contracts):
+        issues.append(('collision', 'order of inherited contracts with storage changed'))
+    for contract, slots in original_contracts.items():
+        candidate_slots = candidate_contracts.get(contract, [])
+        variables = [slot for slot in slots if not is_gap(slot)]
+        candidate_variables = [slot for slot in candidate_slots if not is_gap(slot)]
+        for i, slot in enumerate(variables):
+            name = f'{contract}.{slot.label}'
+            if i >= len(candidate_variables):
+                issues.append(('deleted', f'{name} is deleted'))
+                continue
+            match = candidate_variables[i]
+            if match.label != slot.label and match.renamedFrom != slot.label:
+                issues.append(('collision', f'{name} is replaced with {contract}.{match.label}'))
+            original_type = get_type_label(slot, original_types)
+            candidate_type = get_type_label(match, candidate_types)
+            if original_type != candidate_type and match.retypedFrom != original_type:
+                issues.append(('type change', f'{name} type changed from {original_type} to {candidate_type}'))
+        gaps = [slot for slot in slots if is_gap(slot)]
+        candidate_gaps = [slot for slot in candidate_slots if is_gap(slot)]
+        if gaps and len(candidate_variables) == len(variables):
+            gap_size = _get_array_length(get_type_label(gaps[-1], original_types))
+            candidate_gap_size = _get_array_length(get_type_label(candidate_gaps[-1], candidate_types)) \
+                if candidate_gaps else 0
+            if candidate_gap_size < gap_size:
+                issues.append(('gap shrinkage', f'{contract}.{gaps[-1].label} shrank from {gap_size} ' +
+                               f'to {candidate_gap_size} without new variables'))
+    return issues
+
+
+def _group_by_contract(layout):
+    contracts = {}
+    for slot in layout.storage:
+        contracts.setdefault(slot.contract, []).append(slot)
+    return contracts
+
+
+def _get_array_length(type_label):
+    match = re.search(r'\[(\d+)\]$', type_label)
+    return int(match.group(1)) if match else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest')
+    parser.add_argument('candidate', help='build-info directory or file, or manifest with candidate layouts')
+    parser.add_argument('--all-impls', action='store_true',
+                        help='check every impl, not only the latest one of every contract')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    interner = manifest.Interner()
+    original = manifest.load(args.manifest, interner)
+    candidates = load_candidate_layouts(args.candidate, interner)
+
+    impls = {}
+    for impl_key, impl in original['impls'].items():
+        contract = manifest.get_layout_contract(impl['layout'])
+        if contract is None:
+            continue
+        if args.all_impls:
+            impls[impl_key] = (contract, impl['layout'])
+        else:
+            impls[contract] = (contract, impl['layout'])
+
+    failed = False
+    checked = 0
+    for impl_key, (contract, layout) in impls.items():
+        candidate = candidates.get(contract)
+        if candidate is None:
+            print(f'{contract}: not found in candidate build', file=sys.stderr)
+            continue
+        checked += 1
+        for kind, message in compare_layouts(layout, candidate):
+            failed = True
+            print(f'{contract}: {kind}: {message}' + (f' (impl {impl_key})' if args.all_impls else ''))
+    print(f'Checked {checked} layouts in {time.perf_counter() - start:.3f} s', file=sys.stderr)
+    if failed:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
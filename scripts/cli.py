@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+'''Single entry point of the Python scripts
+
+Usage: cli.py <command> [arguments], run cli.py <command> --help for arguments of a command.
+Only the module of the given command is imported, and heavy dependencies
+like compression libraries are imported by the modules when they are used.
+'''
+
+import argparse
+import importlib
+import sys
+
+# command: (module, description)
+COMMANDS = {
+    'generate-abi': ('generate_abi', 'generate ABI bundle of deployed contracts'),
+    'update-implementations': ('update_implementation_addresses',
+                               'update implementation addresses in the network file'),
+    'change-manifest': ('change_manifest', 'fix storage layouts in the manifest'),
+    'check-storage-layout': ('check_storage_layout', 'check storage layouts against a candidate build'),
+    'dump-storage': ('dump_storage', 'decode storage of proxies with layouts from the manifest'),
+    'diff-storage': ('diff_storage', 'write changes of storage of proxies between two blocks'),
+    'verify-bytecode': ('verify_bytecode', 'verify code deployed at addresses of impls'),
+    'upgrade-history': ('upgrade_history', 'rebuild implementation history of proxies from events'),
+    'verify-networks': ('verify_networks', 'verify implementations on several networks concurrently'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='commands:\n' + '\n'.join(f'  {command:<24}{description}'
+                                         for command, (_, description) in COMMANDS.items()))
+    parser.add_argument('command', choices=COMMANDS, metavar='command')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv = [f'{parser.prog} {args.command}'] + args.arguments
+    module.main()
+
+
+if __name__ == '__main__':
+    main()
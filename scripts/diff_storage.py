@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+'''The script writes differences of decoded storage of proxies between two blocks as JSON lines
+
+Storage roots of proxies at both blocks are compared first with a single batch of eth_getProof calls,
+proxies with equal roots are skipped without reading their storage. Storage of other proxies is read
+at both blocks at once with batched eth_getStorageAt calls and decoded with layouts from the manifest.
+Equal subtrees of decoded values are skipped, every changed value is written as a line:
+
+    {"proxy": "0x...", "path": "Nodes.nodes[1].status", "before": "Active", "after": "Left"}
+'''
+
+import argparse
+import json
+import sys
+
+import dump_storage
+import manifest
+import rpc
+import storage
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before', type=int, help='first block')
+    parser.add_argument('after', type=int, help='second block')
+    parser.add_argument('--manifest', default=manifest.DEFAULT_MANIFEST)
+    parser.add_argument('--proxy', action='append', default=[],
+                        help='address of a proxy to compare in addition to proxies of the manifest')
+    parser.add_argument('--max-items', type=int, default=storage.DEFAULT_MAX_ITEMS,
+                        help='maximum number of items read from every dynamic array and of words of every string')
+    parser.add_argument('--no-proof', action='store_true',
+                        help='do not compare storage roots, for providers without eth_getProof')
+    rpc.add_arguments(parser, pinned_block=False)
+    return parser.parse_args()
+
+
+def get_changed_proxies(client, addresses, blocks):
+    '''Returns addresses whose storage roots differ at the blocks, or all addresses if roots are not available'''
+    calls = [('eth_getProof', [address, [], hex(block)]) for address in addresses for block in blocks]
+    try:
+        proofs = client.batch(calls)
+    except rpc.RpcError as e:
+        print(f'Storage roots are not available: {e}', file=sys.stderr)
+        return addresses
+    roots = [proof['storageHash'] for proof in proofs]
+    return [address for i, address in enumerate(addresses)
+            if len(set(roots[i * len(blocks):(i + 1) * len(blocks)])) > 1]
+
+
+def diff_values(path, before, after):
+    '''Yields (path, before, after) for every changed leaf value'''
+    if before == after:
+        return
+    if isinstance(before, dict) and isinstance(after, dict):
+        for key in list(before) + [key for key in after if key not in before]:
+            yield from diff_values(f'{path}.{key}' if path else key, before.get(key), after.get(key))
+    elif isinstance(before, list) and isinstance(after, list):
+        for i in range(max(len(before), len(after))):
+            yield from diff_values(f'{path}[{i}]',
+                                   before[i] if i < len(before) else None,
+                                   after[i] if i < len(after) else None)
+    else:
+        yield path, before, after
+
+
+def diff_proxy(before, after):
+    for side in (before, after):
+        if 'error' in side:
+            yield 'error', None, side['error']
+            return
+    yield from diff_values('implementation', before['implementation'], after['implementation'])
+    yield from diff_values('', before['storage'], after['storage'])
+
+
+def main():
+    args = parse_arguments()
+    data = manifest.load(args.manifest)
+    index = manifest.ManifestIndex(data)
+    proxy_addresses = dump_storage.get_proxy_addresses(data, args.proxy)
+
+    metrics = rpc.RequestMetrics() if args.metrics else None
+    client = rpc.JsonRpcClient(rpc.get_endpoint(), args.batch_size, metrics=metrics)
+    blocks = (args.before, args.after)
+    changed = proxy_addresses if args.no_proof else get_changed_proxies(client, proxy_addresses, blocks)
+    print(f'{len(proxy_addresses) - len(changed)} of {len(proxy_addresses)} proxies have the same storage root',
+          file=sys.stderr)
+
+    decoders = {(address, block): (address, block, storage.decode_proxy(index, args.max_items))
+                for address in changed for block in blocks}
+    values, rounds = storage.read(decoders, client.batch)
+    differences = 0
+    for address in changed:
+        for path, before, after in diff_proxy(values[(address, args.before)], values[(address, args.after)]):
+            differences += 1
+            print(json.dumps({'proxy': address, 'path': path, 'before': before, 'after': after}))
+    print(f'{differences} differences, storage was read in {rounds} rounds', file=sys.stderr)
+    if metrics is not None:
+        for line in metrics.report():
+            print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
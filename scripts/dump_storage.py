@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+'''The script decodes storage of proxies with storage layouts from the manifest
+
+Implementation of every proxy is read from the EIP-1967 slot and its layout is taken from the manifest.
+All slots are read with batched eth_getStorageAt calls at a pinned block.
+'''
+
+# cspell:words impls
+
+import argparse
+import json
+import sys
+
+import manifest
+import rpc
+import storage
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', nargs='?', default=manifest.DEFAULT_MANIFEST)
+    parser.add_argument('--proxy', action='append', default=[],
+                        help='address of a proxy to dump in addition to proxies of the manifest')
+    parser.add_argument('--max-items', type=int, default=storage.DEFAULT_MAX_ITEMS,
+                        help='maximum number of items read from every dynamic array and of words of every string')
+    rpc.add_arguments(parser)
+    return parser.parse_args()
+
+
+def get_proxy_addresses(data, extra_addresses):
+    addresses = [proxy['address'] for proxy in data['proxies']] + extra_addresses
+    return list(dict.fromkeys(address.lower() for address in addresses))
+
+
+def get_fetch(args, client):
+    '''Returns fetch(calls) reading through the response cache if it is used, and a function saving it'''
+    cache = rpc.open_response_cache(args, client)
+    if cache is None:
+        return client.batch, lambda: None
+
+    def save():
+        cache.save()
+        print(f'{cache.hits} calls were taken from cache', file=sys.stderr)
+    return lambda calls: cache.fetch(calls, client.batch), save
+
+
+def main():
+    args = parse_arguments()
+    data = manifest.load(args.manifest)
+    index = manifest.ManifestIndex(data)
+    proxy_addresses = get_proxy_addresses(data, args.proxy)
+
+    metrics = rpc.RequestMetrics() if args.metrics else None
+    client = rpc.JsonRpcClient(rpc.get_endpoint(), args.batch_size, metrics=metrics)
+    block = args.block if args.block is not None else rpc.get_block_number(client)
+    print(f'Reading state at block {block}', file=sys.stderr)
+
+    fetch, save_cache = get_fetch(args, client)
+    decoders = {address: (address, block, storage.decode_proxy(index, args.max_items))
+                for address in proxy_addresses}
+    proxies, rounds = storage.read(decoders, fetch)
+    save_cache()
+    print(f'{len(proxies)} proxies were read in {rounds} rounds', file=sys.stderr)
+    if metrics is not None:
+        for line in metrics.report():
+            print(line, file=sys.stderr)
+
+    print(json.dumps({'block': block, 'proxies': proxies}, indent=4))
+
+
+if __name__ == '__main__':
+    main()
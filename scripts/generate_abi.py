@@ -1,9 +1,20 @@
 #!/usr/bin/env python
 
+import argparse
+import functools
 import json
+import os
 import sys
 import re
 
+import abi_bundle
+import artifacts
+import cache
+
+SKALE_TOKEN_ADDRESS = '0x00c83aeCC790e8a4453e5dD3B0B4b3680501a7A7'
+SKALE_TOKEN_NAME = 'skale_token'
+SKALE_TOKEN_ABI_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'skale_token_abi.json')
+
 
 def camel_to_snake(name):
     # name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
@@ -11,1050 +22,160 @@ def camel_to_snake(name):
     return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
 
 
-def main():
-    if len(sys.argv) < 3:
-        print('Usage:')
-        print('./generate_abi.py {network file} {build dir}')
-        print('Example:')
-        print('./generate_abi.py ../.openzeppelin/mainnet.json ../build')
+@functools.lru_cache(maxsize=None)
+def get_skale_token_abi():
+    with open(SKALE_TOKEN_ABI_FILENAME) as abi_file:
+        return json.load(abi_file)
+
+
+def get_artifact_stat(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_previous_bundle(filename):
+    if filename is None or not os.path.exists(filename):
+        return {}
+    bundle = abi_bundle.load_file(filename)
+    bundle.pop(abi_bundle.SELECTORS_KEY, None)
+    return bundle
+
+
+def can_reuse(entry, inputs, previous, snake_name, address):
+    '''Checks that the state entry matches inputs and the entry of the contract in the previous bundle'''
+    if entry is None or entry['inputs'] != inputs or snake_name + '_abi' not in previous:
+        return False
+    return previous[snake_name + '_address'] == address and cache.get_hash(previous[snake_name + '_abi']) == entry['abi']
+
+
+def get_changes(previous, result, reloaded):
+    changes = {'added': [], 'changed': {}, 'removed': []}
+    for snake_name in reloaded:
+        if snake_name + '_abi' not in previous:
+            changes['added'].append(snake_name)
+            continue
+        changed = []
+        if previous[snake_name + '_address'] != result[snake_name + '_address']:
+            changed.append('address')
+        if cache.get_hash(previous[snake_name + '_abi']) != cache.get_hash(result[snake_name + '_abi']):
+            changed.append('abi')
+        if changed:
+            changes['changed'][snake_name] = changed
+    for key in sorted(previous):
+        if key.endswith('_abi') and key != SKALE_TOKEN_NAME + '_abi' and key not in result:
+            changes['removed'].append(key[:-len('_abi')])
+    return changes
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        self.print_help()
+        print(message)
         exit(1)
 
+
+def parse_arguments():
+    parser = ArgumentParser(epilog='Example: ./generate_abi.py ../.openzeppelin/mainnet.json ../build')
+    parser.add_argument('network_file')
+    parser.add_argument('build_dir')
+    parser.add_argument('--cache-dir', default=artifacts.DEFAULT_CACHE_DIR,
+                        help='directory to keep ABI extracted from artifacts')
+    parser.add_argument('--no-cache', action='store_true', help='parse every artifact')
+    parser.add_argument('--no-token', action='store_true', help='do not include SKALE token address and ABI')
+    parser.add_argument('--format', choices=abi_bundle.FORMATS, default='json', help='output format')
+    parser.add_argument('--dedup', action='store_true',
+                        help='store every distinct ABI fragment once and refer to it by selector')
+    parser.add_argument('--index', action='store_true',
+                        help='add index of selectors and event topics to the result')
+    parser.add_argument('--output', help='file to write the result to instead of stdout')
+    parser.add_argument('--state',
+                        help='file with hashes of inputs of every contract, enables incremental mode')
+    parser.add_argument('--previous', help='bundle generated by the previous incremental run')
+    parser.add_argument('--diff-report', help='file to write changes found in incremental mode to')
+    parser.add_argument('--jobs', type=int, default=1, help='number of artifacts to load in parallel')
+    parser.add_argument('--threads', action='store_true', help='use threads instead of processes to load artifacts')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
     try:
-        with open(sys.argv[1]) as json_file:
+        with open(args.network_file) as json_file:
             network_file = json.loads(json_file.read())
     except Exception as e:
         print(e)
         exit(2)
 
-    result = {
-        "skale_token_address": "0x00c83aeCC790e8a4453e5dD3B0B4b3680501a7A7",
-        "skale_token_abi": [
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "contractsAddress",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "address[]",
-                        "name": "defOps",
-                        "type": "address[]"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "constructor",
-                "signature": "constructor"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "owner",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "spender",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "uint256",
-                        "name": "value",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "Approval",
-                "type": "event",
-                "signature": "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "tokenHolder",
-                        "type": "address"
-                    }
-                ],
-                "name": "AuthorizedOperator",
-                "type": "event",
-                "signature": "0xf4caeb2d6ca8932a215a353d0703c326ec2d81fc68170f320eb2ab49e9df61f9"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "from",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "Burned",
-                "type": "event",
-                "signature": "0xa78a9be3a7b862d26933ad85fb11d80ef66b8f972d7cbba06621d583943a4098"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "to",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "Minted",
-                "type": "event",
-                "signature": "0x2fe5be0146f74c5bce36c0b80911af6c7d86ff27e89d5cfa61fc681327954e5d"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "tokenHolder",
-                        "type": "address"
-                    }
-                ],
-                "name": "RevokedOperator",
-                "type": "event",
-                "signature": "0x50546e66e5f44d728365dc3908c63bc5cfeeab470722c1677e3073a6ac294aa1"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "sender",
-                        "type": "address"
-                    }
-                ],
-                "name": "RoleGranted",
-                "type": "event",
-                "signature": "0x2f8788117e7eff1d82e926ec794901d17c78024a50270940304540a733656f0d"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "sender",
-                        "type": "address"
-                    }
-                ],
-                "name": "RoleRevoked",
-                "type": "event",
-                "signature": "0xf6391f5c32d9c69d2a47ea670b442974b53935d1edc7fd64eb21e047a839171b"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "from",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "to",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "Sent",
-                "type": "event",
-                "signature": "0x06b541ddaa720db2b10a4d0cdac39b8d360425fc073085fac19bc82614677987"
-            },
-            {
-                "anonymous": False,
-                "inputs": [
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "from",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": True,
-                        "internalType": "address",
-                        "name": "to",
-                        "type": "address"
-                    },
-                    {
-                        "indexed": False,
-                        "internalType": "uint256",
-                        "name": "value",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "Transfer",
-                "type": "event",
-                "signature": "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
-            },
-            {
-                "inputs": [],
-                "name": "CAP",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xec81b483"
-            },
-            {
-                "inputs": [],
-                "name": "DECIMALS",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x2e0f2625"
-            },
-            {
-                "inputs": [],
-                "name": "DEFAULT_ADMIN_ROLE",
-                "outputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "",
-                        "type": "bytes32"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xa217fddf"
-            },
-            {
-                "inputs": [],
-                "name": "NAME",
-                "outputs": [
-                    {
-                        "internalType": "string",
-                        "name": "",
-                        "type": "string"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xa3f4df7e"
-            },
-            {
-                "inputs": [],
-                "name": "SYMBOL",
-                "outputs": [
-                    {
-                        "internalType": "string",
-                        "name": "",
-                        "type": "string"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xf76f8d78"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "holder",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "spender",
-                        "type": "address"
-                    }
-                ],
-                "name": "allowance",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xdd62ed3e"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "spender",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "value",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "approve",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x095ea7b3"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    }
-                ],
-                "name": "authorizeOperator",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x959b8c3f"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "tokenHolder",
-                        "type": "address"
-                    }
-                ],
-                "name": "balanceOf",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x70a08231"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "burn",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xfe9d9303"
-            },
-            {
-                "inputs": [],
-                "name": "contractManager",
-                "outputs": [
-                    {
-                        "internalType": "contract ContractManager",
-                        "name": "",
-                        "type": "address"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xb39e12cf"
-            },
-            {
-                "inputs": [],
-                "name": "decimals",
-                "outputs": [
-                    {
-                        "internalType": "uint8",
-                        "name": "",
-                        "type": "uint8"
-                    }
-                ],
-                "stateMutability": "pure",
-                "type": "function",
-                "constant": True,
-                "signature": "0x313ce567"
-            },
-            {
-                "inputs": [],
-                "name": "defaultOperators",
-                "outputs": [
-                    {
-                        "internalType": "address[]",
-                        "name": "",
-                        "type": "address[]"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x06e48538"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    }
-                ],
-                "name": "getRoleAdmin",
-                "outputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "",
-                        "type": "bytes32"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x248a9ca3"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "index",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "getRoleMember",
-                "outputs": [
-                    {
-                        "internalType": "address",
-                        "name": "",
-                        "type": "address"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x9010d07c"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    }
-                ],
-                "name": "getRoleMemberCount",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xca15c873"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    }
-                ],
-                "name": "grantRole",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x2f2ff15d"
-            },
-            {
-                "inputs": [],
-                "name": "granularity",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x556f0dc7"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    }
-                ],
-                "name": "hasRole",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x91d14854"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "contractManagerAddress",
-                        "type": "address"
-                    }
-                ],
-                "name": "initialize",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xc4d66de8"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "tokenHolder",
-                        "type": "address"
-                    }
-                ],
-                "name": "isOperatorFor",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0xd95b6371"
-            },
-            {
-                "inputs": [],
-                "name": "name",
-                "outputs": [
-                    {
-                        "internalType": "string",
-                        "name": "",
-                        "type": "string"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x06fdde03"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "operatorBurn",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xfc673c4f"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "sender",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "recipient",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "operatorSend",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x62ad1b83"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    }
-                ],
-                "name": "renounceRole",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x36568abe"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "operator",
-                        "type": "address"
-                    }
-                ],
-                "name": "revokeOperator",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xfad8b32a"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "bytes32",
-                        "name": "role",
-                        "type": "bytes32"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    }
-                ],
-                "name": "revokeRole",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xd547741f"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "recipient",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "data",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "send",
-                "outputs": [],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x9bd9bbc6"
-            },
-            {
-                "inputs": [],
-                "name": "symbol",
-                "outputs": [
-                    {
-                        "internalType": "string",
-                        "name": "",
-                        "type": "string"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x95d89b41"
-            },
-            {
-                "inputs": [],
-                "name": "totalSupply",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "view",
-                "type": "function",
-                "constant": True,
-                "signature": "0x18160ddd"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "recipient",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "transfer",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xa9059cbb"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "holder",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "address",
-                        "name": "recipient",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "transferFrom",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x23b872dd"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "account",
-                        "type": "address"
-                    },
-                    {
-                        "internalType": "uint256",
-                        "name": "amount",
-                        "type": "uint256"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "userData",
-                        "type": "bytes"
-                    },
-                    {
-                        "internalType": "bytes",
-                        "name": "operatorData",
-                        "type": "bytes"
-                    }
-                ],
-                "name": "mint",
-                "outputs": [
-                    {
-                        "internalType": "bool",
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xdcdc7dd0"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "wallet",
-                        "type": "address"
-                    }
-                ],
-                "name": "getAndUpdateDelegatedAmount",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0x27040f68"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "wallet",
-                        "type": "address"
-                    }
-                ],
-                "name": "getAndUpdateSlashedAmount",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xb1cb105f"
-            },
-            {
-                "inputs": [
-                    {
-                        "internalType": "address",
-                        "name": "wallet",
-                        "type": "address"
-                    }
-                ],
-                "name": "getAndUpdateLockedAmount",
-                "outputs": [
-                    {
-                        "internalType": "uint256",
-                        "name": "",
-                        "type": "uint256"
-                    }
-                ],
-                "stateMutability": "nonpayable",
-                "type": "function",
-                "signature": "0xfa8dacba"
-            }
-        ]
-    }
+    result = {}
+    if not args.no_token:
+        result[SKALE_TOKEN_NAME + '_address'] = SKALE_TOKEN_ADDRESS
+        result[SKALE_TOKEN_NAME + '_abi'] = get_skale_token_abi()
+    abi_cache = None if args.no_cache else artifacts.AbiCache(args.cache_dir)
+    incremental = args.state is not None
+    state = cache.load_json(args.state, {}) if incremental else {}
+    previous = load_previous_bundle(args.previous) if incremental else {}
+    new_state = {}
+    pending = []
     for alias in network_file['proxies'].keys():
         name = alias.split('/')[-1]
-        address = network_file['proxies'][alias][0]['address']
-        try:
-            artifact_filename = sys.argv[2] + '/contracts/' + name + '.json'
-            with open(artifact_filename) as artifact_file:
-                artifact = json.loads(artifact_file.read())
-                abi = artifact['abi']
-        except Exception as e:
-            print('Error on processing of ' + artifact_file)
-            print(e)
-            exit(3)
         snake_name = camel_to_snake(name)
+        artifact_filename = artifacts.get_artifact_filename(args.build_dir, name)
+        address = network_file['proxies'][alias][0]['address']
+        inputs = {
+            'proxy': cache.get_hash(network_file['proxies'][alias]),
+            'artifact': get_artifact_stat(artifact_filename)
+        }
+        entry = state.get(snake_name)
+        if can_reuse(entry, inputs, previous, snake_name, address):
+            result[snake_name + '_address'] = address
+            result[snake_name + '_abi'] = previous[snake_name + '_abi']
+            new_state[snake_name] = entry
+        else:
+            pending.append((snake_name, artifact_filename, address, inputs))
+
+    loaded = artifacts.load_abis([artifact_filename for _, artifact_filename, _, _ in pending],
+                                 args.jobs, abi_cache, args.threads)
+    failed = False
+    for (snake_name, artifact_filename, address, inputs), (abi, error) in zip(pending, loaded):
+        if error is not None:
+            print('Error on processing of ' + artifact_filename)
+            print(error)
+            failed = True
+            continue
         result[snake_name + '_address'] = address
         result[snake_name + '_abi'] = abi
-    print(json.dumps(result, sort_keys=True, indent=4))
+        new_state[snake_name] = {'inputs': inputs, 'abi': cache.get_hash(abi)}
+    if failed:
+        exit(3)
+    if abi_cache is not None:
+        abi_cache.save()
+        print(f'ABI cache: {abi_cache.hits} hits, {abi_cache.misses} misses', file=sys.stderr)
+    if incremental:
+        reloaded = [snake_name for snake_name, _, _, _ in pending]
+        changes = get_changes(previous, result, reloaded)
+        print(f'Reloaded {len(reloaded)} of {len(network_file["proxies"])} contracts: ' +
+              f'{len(changes["added"])} added, {len(changes["changed"])} changed, ' +
+              f'{len(changes["removed"])} removed', file=sys.stderr)
+        for snake_name, changed in changes['changed'].items():
+            print(f'Changed {" and ".join(changed)} of {snake_name}', file=sys.stderr)
+        if args.diff_report:
+            with open(args.diff_report, 'w') as report_file:
+                json.dump(changes, report_file, sort_keys=True, indent=4)
+        cache.dump_json_atomically(args.state, new_state)
+    if args.index:
+        result = abi_bundle.add_selector_index(result)
+    if args.dedup:
+        result = abi_bundle.deduplicate(result)
+    output = abi_bundle.dump(result, args.format)
+    if args.output:
+        with open(args.output, 'wb') as output_file:
+            output_file.write(output)
+    else:
+        sys.stdout.buffer.write(output)
 
 
 if __name__ == '__main__':
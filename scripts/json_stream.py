@@ -0,0 +1,193 @@
+'''Incremental reading and rewriting of JSON documents that should not be loaded at once'''
+
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CONTAINER_SPECIAL = re.compile(r'["\[\]{}]')
+_PRIMITIVE_END = re.compile(r'[,}\]\s]')
+
+
+def extract_key(json_file, key, chunk_size=CHUNK_SIZE):
+    '''Decodes a single top level key of a JSON object read from json_file.
+
+    The file is read in chunks until the value of the key ends.
+    Values of other keys are skipped without being decoded.
+    '''
+    reader = Reader(json_file, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        raise KeyError(key)
+    while True:
+        name = reader.decode()
+        reader.expect(':')
+        if name == key:
+            return reader.decode()
+        reader.skip_value()
+        separator = reader.next_char()
+        if separator == '}':
+            raise KeyError(key)
+        if separator != ',':
+            raise ValueError(f'Unexpected {separator!r} in JSON object')
+
+
+def rewrite(json_file, output_file, get_transform, indent=2, chunk_size=CHUNK_SIZE):
+    '''Copies JSON from json_file to output_file formatted as json.dump(..., indent=indent) does.
+
+    get_transform(path) is called for every value, where path is a tuple of keys and indexes.
+    If it returns a function, the value is decoded, passed to the function and the result is written.
+    Otherwise objects and arrays are copied member by member, so memory usage does not depend on file size.
+    '''
+    _rewrite_value(Reader(json_file, chunk_size), output_file, get_transform, (), indent, 0)
+
+
+def _rewrite_value(reader, output_file, get_transform, path, indent, level):
+    transform = get_transform(path)
+    opening = reader.peek()
+    if transform is not None or opening not in '[{':
+        value = reader.decode()
+        if transform is not None:
+            value = transform(value)
+        output_file.write(json.dumps(value, indent=indent).replace('\n', '\n' + ' ' * indent * level))
+        return
+
+    closing = '}' if opening == '{' else ']'
+    reader.expect(opening)
+    if reader.peek() == closing:
+        reader.expect(closing)
+        output_file.write(opening + closing)
+        return
+    output_file.write(opening)
+    index = 0
+    while True:
+        output_file.write('\n' + ' ' * indent * (level + 1))
+        if opening == '{':
+            key = reader.decode()
+            reader.expect(':')
+            output_file.write(json.dumps(key) + ': ')
+        else:
+            key = index
+            index += 1
+        _rewrite_value(reader, output_file, get_transform, path + (key,), indent, level + 1)
+        separator = reader.next_char()
+        if separator == closing:
+            break
+        if separator != ',':
+            raise ValueError(f'Unexpected {separator!r} in JSON')
+        output_file.write(',')
+    output_file.write('\n' + ' ' * indent * level + closing)
+
+
+class Reader:
+    '''Reads JSON from a file in chunks keeping only the unread part of the current chunk'''
+
+    def __init__(self, json_file, chunk_size):
+        self.file = json_file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            self._read_more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} in JSON')
+        self.pos += 1
+
+    def next_char(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                end = None
+            # a number may continue in the next chunk, e.g. after "12." or "3e", so it is complete
+            # only if a delimiter follows it or the file ends
+            if end is not None and (isinstance(value, (str, list, dict)) or
+                                    _PRIMITIVE_END.match(self.buffer, end) is not None):
+                self.pos = end
+                return value
+            if not self._read_more(end is not None and end == len(self.buffer)):
+                # the value ends with the file
+                self.pos = len(self.buffer)
+                return value
+
+    def skip_value(self):
+        char = self.peek()
+        if char == '"':
+            self._skip_string()
+        elif char in '[{':
+            self._skip_container()
+        else:
+            self._skip_primitive()
+
+    def _read_more(self, end_allowed=False):
+        '''Appends the next chunk to the buffer, returns False at the end of file if end_allowed'''
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        # grow reads while a long value is being decoded to keep retries logarithmic
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            if end_allowed:
+                return False
+            raise ValueError('Unexpected end of JSON')
+        self.buffer += chunk
+        return True
+
+    def _skip_string(self):
+        self.pos += 1
+        while True:
+            match = _STRING_SPECIAL.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                self._read_more()
+            elif match.group() == '"':
+                self.pos = match.end()
+                return
+            elif match.end() == len(self.buffer):
+                # escaped character is in the next chunk
+                self.pos = match.start()
+                self._read_more()
+            else:
+                self.pos = match.end() + 1
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            match = _CONTAINER_SPECIAL.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                self._read_more()
+                continue
+            char = match.group()
+            self.pos = match.start()
+            if char == '"':
+                self._skip_string()
+                continue
+            self.pos += 1
+            depth += 1 if char in '[{' else -1
+            if depth == 0:
+                return
+
+    def _skip_primitive(self):
+        while True:
+            match = _PRIMITIVE_END.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return
+            self.pos = len(self.buffer)
+            self._read_more()
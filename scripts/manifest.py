@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+'''Loading of OpenZeppelin manifests with storage layouts shared between impls
+
+Storage slots, struct members, type descriptors and whole layouts are converted to named tuples.
+Equal ones are interned, so every distinct value is kept in memory once
+and layouts can be compared by identity. Fields added by newer versions of
+@openzeppelin/upgrades-core are kept in the extra field as JSON encoded values
+and written back unchanged.
+'''
+
+# cspell:words impls
+
+import argparse
+import functools
+import json
+import os
+import sys
+from collections import namedtuple
+
+StorageSlot = namedtuple(
+    'StorageSlot',
+    ['label', 'type', 'contract', 'src', 'offset', 'slot', 'retypedFrom', 'renamedFrom', 'extra'],
+    defaults=(None,) * 7)
+TypeDescriptor = namedtuple('TypeDescriptor', ['label', 'members', 'numberOfBytes', 'extra'], defaults=(None,) * 3)
+Layout = namedtuple('Layout', ['storage', 'types', 'solcVersion', 'extra'], defaults=(None, None))
+
+SIDECAR_VERSION = 1
+DEFAULT_MANIFEST = os.path.dirname(os.path.realpath(__file__)) + '/../.openzeppelin/mainnet.json'
+
+
+class Interner:
+    def __init__(self):
+        self.pool = {}
+
+    def intern(self, value):
+        return self.pool.setdefault(value, value)
+
+    def slot(self, data):
+        return self.intern(_from_dict(StorageSlot, data))
+
+    def type_descriptor(self, data):
+        members = data.get('members')
+        if members is not None:
+            members = self.intern(tuple(member if isinstance(member, str) else self.slot(member)
+                                        for member in members))
+        return self.intern(_from_dict(TypeDescriptor, {**data, 'members': members}))
+
+    def layout(self, data):
+        storage = self.intern(tuple(self.slot(slot) for slot in data['storage']))
+        types = self.intern(tuple((name, self.type_descriptor(descriptor))
+                                  for name, descriptor in data['types'].items()))
+        return self.intern(_from_dict(Layout, {**data, 'storage': storage, 'types': types}))
+
+
+def load(filename, interner=None):
+    '''Loads manifest replacing layout of every impl with an interned Layout'''
+    with open(filename) as manifest_file:
+        return intern_layouts(json.load(manifest_file), interner)
+
+
+def intern_layouts(manifest, interner=None):
+    interner = interner or Interner()
+    for impl in manifest['impls'].values():
+        impl['layout'] = interner.layout(impl['layout'])
+    return manifest
+
+
+def is_manifest(data):
+    '''Checks that decoded JSON is a manifest of the current format and not a legacy network file'''
+    return 'manifestVersion' in data
+
+
+def get_layout_contract(layout):
+    '''Returns the most derived contract with storage, it names the impl'''
+    return layout.storage[-1].contract if layout.storage else None
+
+
+def has_positions(layout):
+    '''Checks that slot positions are known, layouts of old manifests only have order of variables'''
+    return all(slot.slot is not None for slot in layout.storage)
+
+
+class ManifestIndex:
+    '''Lookups of impls by address, built once for a loaded manifest'''
+    def __init__(self, manifest):
+        self.impls_by_address = {}
+        self.layouts_by_address = {}
+        for key, impl in manifest['impls'].items():
+            address = impl['address'].lower()
+            self.impls_by_address[address] = (key, impl)
+            self.layouts_by_address[address] = impl['layout']
+
+    def find_impl(self, address):
+        '''Returns (impl key, impl) of the impl deployed at address or None'''
+        return self.impls_by_address.get(address.lower())
+
+    def get_layout(self, address):
+        return self.layouts_by_address.get(address.lower())
+
+
+@functools.lru_cache(maxsize=None)
+def get_type_table(types):
+    '''Returns dict of type descriptors by type name for Layout.types'''
+    return dict(types)
+
+
+def layout_to_dict(layout):
+    '''Converts Layout back to the form used in manifest files'''
+    result = _to_dict(layout)
+    result['storage'] = [_to_dict(slot) for slot in layout.storage]
+    result['types'] = {name: type_descriptor_to_dict(descriptor) for name, descriptor in layout.types}
+    return result
+
+
+def type_descriptor_to_dict(descriptor):
+    result = _to_dict(descriptor)
+    if descriptor.members is not None:
+        result['members'] = [member if isinstance(member, str) else _to_dict(member)
+                             for member in descriptor.members]
+    return result
+
+
+def dump_sidecar(manifest, sidecar_file):
+    '''Writes manifest loaded by load() with every distinct slot, type and layout stored once'''
+    slots = _Table()
+    type_descriptors = _Table()
+    layouts = _Table()
+
+    def add_slot(slot):
+        return slots.add(slot, _to_dict)
+
+    def add_type_descriptor(descriptor):
+        def encode(value):
+            result = _to_dict(value)
+            if value.members is not None:
+                result['members'] = [member if isinstance(member, str) else add_slot(member)
+                                     for member in value.members]
+            return result
+        return type_descriptors.add(descriptor, encode)
+
+    def encode_layout(layout):
+        result = _to_dict(layout)
+        result['storage'] = [add_slot(slot) for slot in layout.storage]
+        result['types'] = [[name, add_type_descriptor(descriptor)] for name, descriptor in layout.types]
+        return result
+
+    impls = {}
+    for key, impl in manifest['impls'].items():
+        impls[key] = {**impl, 'layout': layouts.add(impl['layout'], encode_layout)}
+    json.dump({
+        'version': SIDECAR_VERSION,
+        'slots': slots.items,
+        'types': type_descriptors.items,
+        'layouts': layouts.items,
+        'manifest': {**manifest, 'impls': impls}
+    }, sidecar_file, separators=(',', ':'))
+
+
+def load_sidecar(filename, interner=None):
+    '''Loads a file written by dump_sidecar() to the same form load() returns'''
+    with open(filename) as sidecar_file:
+        sidecar = json.load(sidecar_file)
+    if sidecar.get('version') != SIDECAR_VERSION:
+        raise ValueError(f'Unsupported sidecar version {sidecar.get("version")}')
+    interner = interner or Interner()
+    slots = [interner.slot(slot) for slot in sidecar['slots']]
+    type_descriptors = []
+    for descriptor in sidecar['types']:
+        members = descriptor.get('members')
+        if members is not None:
+            members = interner.intern(tuple(member if isinstance(member, str) else slots[member]
+                                            for member in members))
+        type_descriptors.append(interner.intern(_from_dict(TypeDescriptor, {**descriptor, 'members': members})))
+    layouts = []
+    for layout in sidecar['layouts']:
+        layouts.append(interner.intern(_from_dict(Layout, {
+            **layout,
+            'storage': interner.intern(tuple(slots[i] for i in layout['storage'])),
+            'types': interner.intern(tuple((name, type_descriptors[i]) for name, i in layout['types']))
+        })))
+    manifest = sidecar['manifest']
+    for impl in manifest['impls'].values():
+        impl['layout'] = layouts[impl['layout']]
+    return manifest
+
+
+class _Table:
+    def __init__(self):
+        self.items = []
+        self.ids = {}
+
+    def add(self, value, encode):
+        if value not in self.ids:
+            item = encode(value)
+            self.ids[value] = len(self.items)
+            self.items.append(item)
+        return self.ids[value]
+
+
+def _from_dict(cls, data):
+    '''Creates named tuple from dict, fields it does not have are kept in extra as (field, JSON) pairs'''
+    known = {field: item for field, item in data.items() if field in cls._fields and field != 'extra'}
+    extra = tuple((field, json.dumps(item)) for field, item in data.items() if field not in known)
+    return cls(**known, extra=extra or None)
+
+
+def _to_dict(value):
+    result = {field: item for field, item in value._asdict().items() if item is not None and field != 'extra'}
+    for field, item in value.extra or ():
+        result[field] = json.loads(item)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest')
+    parser.add_argument('--sidecar', help='file to write deduplicated form of the manifest to')
+    args = parser.parse_args()
+
+    interner = Interner()
+    manifest = load(args.manifest, interner)
+    impls = manifest['impls'].values()
+    layouts = {id(impl['layout']) for impl in impls}
+    types = sum(len(impl['layout'].types) for impl in impls)
+    slots = sum(len(impl['layout'].storage) for impl in impls)
+    distinct_types = {id(descriptor) for impl in impls for _, descriptor in impl['layout'].types}
+    distinct_slots = {id(slot) for impl in impls for slot in impl['layout'].storage}
+    print(f'{len(impls)} impls, {len(layouts)} distinct layouts', file=sys.stderr)
+    print(f'{types} type descriptors, {len(distinct_types)} distinct', file=sys.stderr)
+    print(f'{slots} storage slots, {len(distinct_slots)} distinct', file=sys.stderr)
+    if args.sidecar:
+        with open(args.sidecar, 'w') as sidecar_file:
+            dump_sidecar(manifest, sidecar_file)
+
+
+if __name__ == '__main__':
+    main()
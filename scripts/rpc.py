@@ -0,0 +1,349 @@
+'''Minimal JSON-RPC client used by the scripts to batch on-chain reads'''
+
+# cspell:words jsonrpc
+
+import base64
+import bisect
+import gzip
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+import cache
+
+DEFAULT_ENDPOINT = 'http://localhost:8545'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = DEFAULT_CONCURRENCY
+DEFAULT_CACHE_DIR = cache.get_cache_dir('rpc')
+
+
+class RpcError(Exception):
+    pass
+
+
+class BatchTooLarge(RpcError):
+    pass
+
+
+def add_arguments(parser, pinned_block=True):
+    '''Adds --batch-size and --metrics to parser, and with pinned_block also --block and the response cache options'''
+    if pinned_block:
+        parser.add_argument('--block', type=int,
+                            help='block to read the state at, the latest block at start is used by default')
+        parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                            help='directory to cache responses at the block given with --block')
+        parser.add_argument('--no-cache', action='store_true', help='do not cache responses on disk')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='maximum number of calls in one batch, reduced automatically if the provider refuses it')
+    parser.add_argument('--metrics', action='store_true',
+                        help='print latency histogram and transferred bytes of every RPC method')
+
+
+def get_endpoint():
+    return os.environ.get('ENDPOINT') or os.environ.get('WEB3_PROVIDER_URI') or DEFAULT_ENDPOINT
+
+
+def to_block_parameter(block):
+    return block if isinstance(block, str) else hex(block)
+
+
+def get_block_number(client):
+    return int(client.call('eth_blockNumber', []), 16)
+
+
+def get_chain_id(client):
+    return int(client.call('eth_chainId', []), 16)
+
+
+def get_block_hash(client, block):
+    return client.call('eth_getBlockByNumber', [hex(block), False])['hash']
+
+
+def encode_address(address):
+    return address.lower()[2:].rjust(64, '0')
+
+
+def decode_address(data):
+    if len(data) < 42:
+        raise RpcError(f'Can\'t decode address from {data}')
+    return '0x' + data[-40:]
+
+
+class RequestMetrics:
+    '''Latency histograms and transferred bytes of JSON-RPC requests by method.
+
+    A batch is counted as one request of its method, or of "batch" if it mixes methods.
+    Received bytes are counted as sent over the wire, before decompression.
+    '''
+
+    # Upper bounds of latency buckets in seconds, the last bucket is unbounded
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, calls, elapsed, sent, received):
+        with self._lock:
+            stats = self.methods.get(method)
+            if stats is None:
+                stats = self.methods[method] = {
+                    'requests': 0, 'calls': 0, 'seconds': 0.0, 'sent': 0, 'received': 0,
+                    'histogram': [0] * (len(self.BUCKETS) + 1)
+                }
+            stats['requests'] += 1
+            stats['calls'] += calls
+            stats['seconds'] += elapsed
+            stats['sent'] += sent
+            stats['received'] += received
+            stats['histogram'][bisect.bisect_left(self.BUCKETS, elapsed)] += 1
+
+    def report(self):
+        '''Returns lines with totals and latency histogram of every method'''
+        bounds = [f'<{bound * 1000:g}ms' for bound in self.BUCKETS] + ['more']
+        lines = []
+        for method, stats in sorted(self.methods.items()):
+            lines.append(f'{method}: {stats["requests"]} requests, {stats["calls"]} calls, ' +
+                         f'{stats["seconds"] / stats["requests"] * 1000:.1f} ms average, ' +
+                         f'{stats["sent"]} bytes sent, {stats["received"]} bytes received')
+            lines.append('    ' + ' '.join(f'{bound}:{count}' for bound, count in zip(bounds, stats['histogram'])
+                                          if count))
+        return lines
+
+
+def get_method_name(payload):
+    '''Returns (method, number of calls) of a JSON-RPC request or batch for metrics'''
+    if not isinstance(payload, list):
+        return payload.get('method'), 1
+    methods = {request.get('method') for request in payload}
+    return (methods.pop() if len(methods) == 1 else 'batch'), len(payload)
+
+
+class HttpTransport:
+    '''Posts requests over a pool of at most pool_size keep-alive connections, accepting gzip responses'''
+
+    def __init__(self, endpoint, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, metrics=None):
+        import http.client
+
+        url = urllib.parse.urlsplit(endpoint)
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported endpoint {endpoint!r}, only http:// and https:// endpoints are supported,' +
+                             ' not WebSocket or IPC ones')
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.host = url.hostname
+        self.port = url.port
+        self.path = (url.path or '/') + ('?' + url.query if url.query else '')
+        self.timeout = timeout
+        self.metrics = metrics
+        self.headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        if url.username is not None:
+            credentials = f'{urllib.parse.unquote(url.username)}:{urllib.parse.unquote(url.password or "")}'
+            self.headers['Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def post(self, payload):
+        '''Returns (status, reason, body) of the response to JSON payload'''
+        body = json.dumps(payload).encode()
+        start = time.perf_counter()
+        with self._slots:
+            status, reason, encoding, data = self._request(body)
+        elapsed = time.perf_counter() - start
+        if self.metrics is not None:
+            method, calls = get_method_name(payload)
+            self.metrics.record(method, calls, elapsed, len(body), len(data))
+        if encoding == 'gzip':
+            data = gzip.decompress(data)
+        return status, reason, data
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    def _request(self, body):
+        import http.client
+
+        while True:
+            try:
+                connection, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                connection, reused = self.connection_class(self.host, self.port, timeout=self.timeout), False
+            try:
+                connection.request('POST', self.path, body, self.headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                # The server may drop an idle keep-alive connection, so retry on a new one
+                if reused and isinstance(e, (ConnectionError, http.client.BadStatusLine)):
+                    continue
+                if isinstance(e, http.client.HTTPException):
+                    raise RpcError(f'HTTP request failed: {e!r}')
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response.status, response.reason, response.getheader('Content-Encoding'), data
+
+
+class JsonRpcClient:
+    def __init__(self, endpoint, batch_size=DEFAULT_BATCH_SIZE, timeout=30, pool_size=DEFAULT_POOL_SIZE,
+                 metrics=None):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.transport = HttpTransport(endpoint, pool_size, timeout, metrics)
+        self._ids = itertools.count(1)
+
+    def call(self, method, params):
+        return self.batch([(method, params)])[0]
+
+    def batch(self, calls):
+        '''Sends calls as JSON-RPC batches and returns results in the same order.
+
+        Batch size is halved every time the provider rejects a batch as too large.
+        '''
+        results = []
+        start = 0
+        while start < len(calls):
+            chunk = calls[start:start + self.batch_size]
+            try:
+                results.extend(self._send_batch(chunk))
+            except BatchTooLarge:
+                if len(chunk) == 1:
+                    raise
+                self.batch_size = (len(chunk) + 1) // 2
+                continue
+            start += len(chunk)
+        return results
+
+    def _send_batch(self, calls):
+        payload = []
+        for method, params in calls:
+            payload.append({'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params})
+        response = self._post(payload)
+
+        if not isinstance(response, list):
+            # Providers answer a batch over their limit with a single error object
+            if len(calls) > 1:
+                raise BatchTooLarge(_error_message(response))
+            response = [response]
+        replies = {reply.get('id'): reply for reply in response}
+        results = []
+        for request in payload:
+            reply = replies.get(request['id'])
+            if reply is None:
+                if len(calls) > 1:
+                    raise BatchTooLarge(f'No response for request {request["id"]}')
+                raise RpcError(f'No response for {request["method"]}')
+            if 'error' in reply:
+                message = _error_message(reply)
+                if len(calls) > 1 and 'batch' in message.lower():
+                    raise BatchTooLarge(message)
+                raise RpcError(f'{request["method"]} failed: {message}')
+            results.append(reply['result'])
+        return results
+
+    def _post(self, payload):
+        status, reason, data = self.transport.post(payload)
+        if status == 413:
+            raise BatchTooLarge(f'HTTP {status}: {reason}')
+        # Some providers report JSON-RPC errors with a non 200 status
+        try:
+            return json.loads(data)
+        except ValueError:
+            raise RpcError(f'HTTP {status}: {reason}')
+
+
+def concurrent_calls(client, calls, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, backoff=0.5):
+    '''Runs single calls concurrently on an asyncio loop and returns results in the order of calls.
+
+    At most `concurrency` requests are in flight. A call that fails or exceeds the timeout of the client
+    is retried up to `retries` times with exponential backoff and random jitter.
+    '''
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(method, params):
+            async with semaphore:
+                for attempt in range(retries + 1):
+                    # A worker thread can't be cancelled, so the timeout is left to the socket of the client
+                    try:
+                        return await loop.run_in_executor(executor, client.call, method, params)
+                    except (RpcError, OSError):
+                        if attempt == retries:
+                            raise
+                    await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        return await asyncio.gather(*[call(method, params) for method, params in calls])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return asyncio.run(run())
+
+
+class ResponseCache:
+    '''On-disk cache of call results at a fixed block, keyed by block hash and call data.
+
+    Unlike block numbers, hashes differ between chains and between runs of a restarted local node.
+    '''
+
+    def __init__(self, cache_dir, block_hash):
+        self.filename = os.path.join(cache_dir, f'{block_hash}.json')
+        self.responses = cache.load_json(self.filename, {})
+        self.hits = 0
+        self.changed = False
+
+    @staticmethod
+    def key(method, params):
+        return json.dumps([method, params], sort_keys=True, separators=(',', ':'))
+
+    def fetch(self, calls, fetch):
+        '''Returns results of calls taking missing ones from fetch(calls)'''
+        keys = [self.key(method, params) for method, params in calls]
+        missing = [(key, call) for key, call in zip(keys, calls) if key not in self.responses]
+        self.hits += len(calls) - len(missing)
+        if missing:
+            results = fetch([call for _, call in missing])
+            for (key, _), result in zip(missing, results):
+                self.responses[key] = result
+            self.changed = True
+        return [self.responses[key] for key in keys]
+
+    def save(self):
+        '''Writes new responses to disk, a failure is reported but does not stop the script'''
+        if self.changed:
+            try:
+                cache.dump_json_atomically(self.filename, self.responses)
+            except OSError as e:
+                print(f'Can\'t save response cache: {e}', file=sys.stderr)
+            self.changed = False
+
+
+def open_response_cache(args, client):
+    '''Returns ResponseCache for the block given with --block, or None.
+
+    Responses at the latest block are not cached, a rerun reads them at a newer block anyway.
+    '''
+    if args.no_cache or args.block is None:
+        return None
+    return ResponseCache(args.cache_dir, get_block_hash(client, args.block))
+
+
+def _error_message(reply):
+    error = reply.get('error')
+    if isinstance(error, dict):
+        return str(error.get('message', error))
+    return str(error)
@@ -0,0 +1,62 @@
+'''Snapshot of implementations registered in ProxyAdmin for verification without network access
+
+The snapshot keeps chain id, ProxyAdmin address and, for every proxy,
+its implementation and the block it was read at:
+
+    {"version": 1, "chainId": 1, "proxyAdmin": "0x...",
+     "proxies": {"<proxy address>": {"implementation": "0x...", "block": 123}}}
+
+Addresses are lowercase.
+'''
+
+import json
+
+import cache
+
+SNAPSHOT_VERSION = 1
+
+
+def create(chain_id, proxy_admin_address):
+    return {'version': SNAPSHOT_VERSION, 'chainId': chain_id, 'proxyAdmin': proxy_admin_address.lower(), 'proxies': {}}
+
+
+def load(filename):
+    with open(filename) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported snapshot version {snapshot.get("version")}')
+    return snapshot
+
+
+def save(filename, snapshot):
+    with cache.open_atomically(filename) as snapshot_file:
+        json.dump(snapshot, snapshot_file, sort_keys=True, separators=(',', ':'))
+
+
+def check(snapshot, chain_id, proxy_admin_address):
+    if chain_id is not None and snapshot['chainId'] != chain_id:
+        raise ValueError(f'Snapshot is made for chain {snapshot["chainId"]}, not for {chain_id}')
+    if snapshot['proxyAdmin'] != proxy_admin_address.lower():
+        raise ValueError(f'Snapshot is made for ProxyAdmin {snapshot["proxyAdmin"]}, not for {proxy_admin_address}')
+
+
+def get_stale(snapshot, proxy_addresses, min_block=None):
+    '''Returns proxy addresses that are missing in the snapshot or were read before min_block'''
+    proxies = snapshot['proxies']
+    return [address for address in proxy_addresses
+            if address.lower() not in proxies or
+            (min_block is not None and proxies[address.lower()]['block'] < min_block)]
+
+
+def update(snapshot, block, implementations):
+    '''Stores implementations read at block, implementations is a dict by proxy address'''
+    for proxy_address, implementation in implementations.items():
+        snapshot['proxies'][proxy_address.lower()] = {'implementation': implementation.lower(), 'block': block}
+
+
+def get_implementations(snapshot, proxy_addresses):
+    '''Returns a list of implementations of proxies, every proxy must be in the snapshot'''
+    missing = get_stale(snapshot, proxy_addresses)
+    if missing:
+        raise ValueError(f'Proxies are missing in the snapshot: {", ".join(missing)}')
+    return [snapshot['proxies'][address.lower()]['implementation'] for address in proxy_addresses]
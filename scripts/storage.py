@@ -0,0 +1,201 @@
+'''Decoding of contract storage with storage layouts from the manifest
+
+Decoders are generators: they yield lists of slots they need, receive a dict
+of storage words by slot and finally return the decoded value. Decoders of
+independent values run in lockstep, so reading a whole layout takes as many
+rounds of eth_getStorageAt batches as the deepest chain of dynamic values,
+not one call per variable.
+
+Values are decoded to JSON compatible types. Mappings can't be enumerated
+and are returned as {"mapping": <slot>}. Dynamic arrays longer than max_items
+are returned as {"length": <length>, "items": <first max_items items>}, and
+strings and bytes longer than max_items words as {"length": <length>, "data": <their start>}.
+'''
+
+# cspell:words keccak
+
+import re
+
+import manifest
+
+# bytes32(uint256(keccak256('eip1967.proxy.implementation')) - 1)
+IMPLEMENTATION_SLOT = 0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc
+DEFAULT_MAX_ITEMS = 1000
+
+_ARRAY_TYPE = re.compile(r'^t_array\((.*)\)(dyn|\d+)_storage$')
+
+
+def keccak_slot(slot):
+    from eth_utils import keccak
+
+    return int.from_bytes(keccak(slot.to_bytes(32, 'big')), 'big')
+
+
+def gather(decoders):
+    '''Runs decoders in lockstep and returns the list of their values'''
+    results = [None] * len(decoders)
+    pending = {}
+    for i, decoder in enumerate(decoders):
+        try:
+            pending[i] = decoder.send(None)
+        except StopIteration as e:
+            results[i] = e.value
+    while pending:
+        words = yield sorted(set().union(*pending.values()))
+        for i in list(pending):
+            try:
+                pending[i] = decoders[i].send(words)
+            except StopIteration as e:
+                results[i] = e.value
+                del pending[i]
+    return results
+
+
+def _constant(value):
+    return value
+    yield
+
+
+class LayoutDecoder:
+    def __init__(self, layout, max_items=DEFAULT_MAX_ITEMS):
+        if not manifest.has_positions(layout):
+            raise ValueError('Storage layout has no slot positions')
+        self.layout = layout
+        self.types = manifest.get_type_table(layout.types)
+        self.max_items = max_items
+
+    def decode(self):
+        '''Returns a decoder of all variables grouped by contract: {contract: {label: value}}'''
+        storage = self.layout.storage
+        values = yield from gather([self.decode_value(slot.type, int(slot.slot), slot.offset) for slot in storage])
+        result = {}
+        for slot, value in zip(storage, values):
+            result.setdefault(slot.contract, {})[slot.label] = value
+        return result
+
+    def decode_value(self, type_name, slot, offset=0):
+        if type_name.startswith('t_mapping'):
+            return _constant({'mapping': hex(slot)})
+        if type_name.startswith('t_struct'):
+            return self._decode_struct(type_name, slot)
+        array = _ARRAY_TYPE.match(type_name)
+        if array is not None:
+            element_type, length = array.groups()
+            if length == 'dyn':
+                return self._decode_dynamic_array(element_type, slot)
+            return self._decode_static_array(element_type, slot, int(length))
+        if type_name in ('t_string_storage', 't_bytes_storage'):
+            return self._decode_bytes(type_name, slot)
+        return self._decode_word(type_name, slot, offset)
+
+    def get_size(self, type_name):
+        return int(self.types[type_name].numberOfBytes)
+
+    def _decode_word(self, type_name, slot, offset):
+        words = yield [slot]
+        size = self.get_size(type_name)
+        value = (words[slot] >> (offset * 8)) & ((1 << (size * 8)) - 1)
+        if type_name == 't_bool':
+            return value != 0
+        if type_name == 't_address' or type_name.startswith('t_contract'):
+            return f'0x{value:040x}'
+        if type_name.startswith('t_int'):
+            return value - (1 << (size * 8)) if value >> (size * 8 - 1) else value
+        if type_name.startswith('t_enum'):
+            members = self.types[type_name].members
+            return members[value] if members is not None and value < len(members) else value
+        if type_name.startswith('t_uint'):
+            return value
+        return '0x' + value.to_bytes(size, 'big').hex()
+
+    def _decode_struct(self, type_name, slot):
+        members = self.types[type_name].members
+        values = yield from gather([self.decode_value(member.type, slot + int(member.slot), member.offset)
+                                    for member in members])
+        return {member.label: value for member, value in zip(members, values)}
+
+    def _decode_static_array(self, element_type, slot, length):
+        size = self.get_size(element_type)
+        decoders = []
+        if size < 32:
+            per_slot = 32 // size
+            for i in range(length):
+                decoders.append(self.decode_value(element_type, slot + i // per_slot, i % per_slot * size))
+        else:
+            slots_per_element = (size + 31) // 32
+            for i in range(length):
+                decoders.append(self.decode_value(element_type, slot + i * slots_per_element))
+        return (yield from gather(decoders))
+
+    def _decode_dynamic_array(self, element_type, slot):
+        words = yield [slot]
+        length = words[slot]
+        items = yield from self._decode_static_array(element_type, keccak_slot(slot), min(length, self.max_items))
+        if length > self.max_items:
+            return {'length': length, 'items': items}
+        return items
+
+    def _decode_bytes(self, type_name, slot):
+        words = yield [slot]
+        word = words[slot]
+        capped = False
+        if word & 1 == 0:
+            data = word.to_bytes(32, 'big')[:(word & 0xff) // 2]
+        else:
+            length = (word - 1) // 2
+            count = (length + 31) // 32
+            capped = count > self.max_items
+            start = keccak_slot(slot)
+            slots = [start + i for i in range(min(count, self.max_items))]
+            words = yield slots
+            data = b''.join(words[data_slot].to_bytes(32, 'big') for data_slot in slots)[:length]
+        data = data.decode(errors='replace') if type_name == 't_string_storage' else '0x' + data.hex()
+        return {'length': length, 'data': data} if capped else data
+
+
+def decode_proxy(index, max_items=DEFAULT_MAX_ITEMS):
+    '''Returns a decoder of the proxy implementation from EIP-1967 slot and of the storage with its layout'''
+    words = yield [IMPLEMENTATION_SLOT]
+    implementation = f'0x{words[IMPLEMENTATION_SLOT]:040x}'
+    result = {'implementation': implementation}
+    layout = index.get_layout(implementation)
+    if layout is None:
+        return {**result, 'error': 'Implementation is not found in the manifest'}
+    result['contract'] = manifest.get_layout_contract(layout)
+    if not manifest.has_positions(layout):
+        return {**result, 'error': 'Storage layout of the implementation has no slot positions'}
+    result['storage'] = yield from LayoutDecoder(layout, max_items).decode()
+    return result
+
+
+def read(decoders, fetch):
+    '''Runs decoders of storage of several addresses, given as {key: (address, block, decoder)}.
+
+    Slots requested by all decoders in a round are read with a single fetch(calls).
+    Returns ({key: value}, number of rounds).
+    '''
+    results = {}
+    pending = {}
+    words = {}
+    for key, (address, block, decoder) in decoders.items():
+        try:
+            pending[key] = ((address.lower(), block), decoder, decoder.send(None))
+        except StopIteration as e:
+            results[key] = e.value
+    rounds = 0
+    while pending:
+        rounds += 1
+        missing = sorted({(source, slot) for source, _, slots in pending.values() for slot in slots
+                          if (source, slot) not in words})
+        values = fetch([('eth_getStorageAt', [address, hex(slot), hex(block)])
+                        for (address, block), slot in missing])
+        for position, value in zip(missing, values):
+            words[position] = int(value, 16)
+        for key, (source, decoder, slots) in list(pending.items()):
+            try:
+                requested = decoder.send({slot: words[(source, slot)] for slot in slots})
+                pending[key] = (source, decoder, requested)
+            except StopIteration as e:
+                results[key] = e.value
+                del pending[key]
+    return results, rounds
@@ -0,0 +1,48 @@
+'''Tests of incremental JSON reading with every chunk size up to the document length
+
+Run from the scripts directory with: python -m unittest test_json_stream
+'''
+
+import io
+import json
+import unittest
+
+import json_stream
+
+DOCUMENT = {
+    'manifestVersion': '3.2',
+    'numbers': [0, -7, 1.25, 3e5, -12.5e-3, 12345678901234567890, 1E+2],
+    'literals': [True, False, None],
+    'strings': ['', 'quote " and backslash \\', 'escaped \n and é', '{[,]}'],
+    'empty': [{}, []],
+    'abi': [{'type': 'function', 'name': 'f', 'inputs': [{'name': 'a', 'type': 'uint256'}]}],
+    'last': 12.5e3
+}
+
+
+class JsonStreamTest(unittest.TestCase):
+    def test_rewrite(self):
+        text = json.dumps(DOCUMENT)
+        expected = json.dumps(DOCUMENT, indent=2)
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                output = io.StringIO()
+                json_stream.rewrite(io.StringIO(text), output, lambda path: None, 2, chunk_size)
+                self.assertEqual(output.getvalue(), expected)
+
+    def test_extract_key(self):
+        text = json.dumps(DOCUMENT)
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                for key, value in DOCUMENT.items():
+                    self.assertEqual(json_stream.extract_key(io.StringIO(text), key, chunk_size), value)
+
+    def test_number_at_chunk_boundary(self):
+        text = '{"x": 1, "abi": 12.5e3, "y": 2}'
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(json_stream.extract_key(io.StringIO(text), 'abi', chunk_size), 12500.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
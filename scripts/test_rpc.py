@@ -0,0 +1,150 @@
+'''Tests of the JSON-RPC client against a local stand-in of a provider
+
+Run from the scripts directory with: python -m unittest test_rpc
+'''
+
+import http.server
+import json
+import socket
+import threading
+import time
+import unittest
+
+import rpc
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        if isinstance(payload, list):
+            server.batches.append(len(payload))
+        # JsonRpcClient sends a single call as a batch of one
+        if not isinstance(payload, list) or len(payload) == 1:
+            with server.lock:
+                slow = server.slow_calls > 0
+                server.slow_calls -= slow
+            if slow:
+                time.sleep(server.delay)
+        if isinstance(payload, list):
+            if server.max_batch is not None and len(payload) > server.max_batch:
+                if server.over_limit == 'status':
+                    self.send_reply(413, b'')
+                    return
+                if server.over_limit == 'truncate':
+                    response = [answer(request) for request in payload[:server.max_batch]]
+                else:
+                    response = {'jsonrpc': '2.0', 'id': None,
+                                'error': {'code': -32600, 'message': 'Batch size is too large'}}
+            else:
+                response = [answer(request) for request in payload]
+        else:
+            response = answer(payload)
+        self.send_reply(200, json.dumps(response).encode())
+
+    def send_reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def answer(request):
+    if request['method'] == 'fail':
+        return {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': 3, 'message': 'execution reverted'}}
+    return {'jsonrpc': '2.0', 'id': request['id'], 'result': request['params'][0]}
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    '''Provider answering every call with its first parameter and "fail" calls with an error.
+
+    Batches longer than max_batch are refused the way over_limit says:
+    "error" answers with a single error object, "truncate" drops replies over the limit
+    and "status" answers with HTTP 413. First slow_calls single calls are answered after delay seconds.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, max_batch=None, over_limit='error', slow_calls=0, delay=0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.max_batch = max_batch
+        self.over_limit = over_limit
+        self.slow_calls = slow_calls
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.batches = []
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class JsonRpcClientTest(unittest.TestCase):
+    def start(self, timeout=30, **kwargs):
+        server = StandIn(**kwargs)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = rpc.JsonRpcClient(server.endpoint, batch_size=8, timeout=timeout)
+        self.addCleanup(client.transport.close)
+        return server, client
+
+    def test_batch_keeps_order(self):
+        server, client = self.start()
+        calls = [('echo', [i]) for i in range(20)]
+        self.assertEqual(client.batch(calls), list(range(20)))
+        self.assertEqual(server.batches, [8, 8, 4])
+
+    def test_capped_batches(self):
+        for over_limit in ('error', 'truncate', 'status'):
+            with self.subTest(over_limit=over_limit):
+                server, client = self.start(max_batch=2, over_limit=over_limit)
+                calls = [('echo', [i]) for i in range(7)]
+                self.assertEqual(client.batch(calls), list(range(7)))
+                self.assertEqual(client.batch_size, 2)
+                self.assertEqual(server.batches, [7, 4, 2, 2, 2, 1])
+
+    def test_error_in_batch(self):
+        server, client = self.start()
+        calls = [('echo', [1]), ('fail', [2]), ('echo', [3])]
+        with self.assertRaisesRegex(rpc.RpcError, 'fail failed: execution reverted') as raised:
+            client.batch(calls)
+        self.assertNotIsInstance(raised.exception, rpc.BatchTooLarge)
+        self.assertEqual(client.batch_size, 8)
+
+    def test_error_in_single_call(self):
+        server, client = self.start(max_batch=1)
+        with self.assertRaisesRegex(rpc.RpcError, 'fail failed: execution reverted'):
+            client.call('fail', [1])
+        self.assertEqual(client.call('echo', ['0x1']), '0x1')
+
+    def test_concurrent_calls_retry_timeouts(self):
+        server, client = self.start(timeout=0.2, slow_calls=4, delay=1)
+        calls = [('echo', [i]) for i in range(8)]
+        self.assertEqual(rpc.concurrent_calls(client, calls, concurrency=4, retries=1, backoff=0), list(range(8)))
+        self.assertEqual(server.slow_calls, 0)
+        self.assertEqual(len(server.batches), 12)
+
+    def test_concurrent_calls_without_retries(self):
+        server, client = self.start(timeout=0.2, slow_calls=1, delay=1)
+        with self.assertRaises(socket.timeout):
+            rpc.concurrent_calls(client, [('echo', [1])], retries=0)
+        self.assertEqual(server.slow_calls, 0)
+
+    def test_unsupported_endpoint(self):
+        for endpoint in ('ws://127.0.0.1:8546', '/var/run/geth.ipc'):
+            with self.subTest(endpoint=endpoint):
+                with self.assertRaisesRegex(ValueError, 'only http:// and https:// endpoints'):
+                    rpc.JsonRpcClient(endpoint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,59 +1,207 @@
 #!/usr/bin/env python
 
+import argparse
 import os
 import sys
 import json
 
-PROXY_ADMIN_ABI = [{"constant": True, "inputs": [{"name": "proxy", "type": "address"}],
-                    "name": "getProxyImplementation", "outputs": [{"name": "", "type": "address"}],
-                    "payable": False, "stateMutability": "view", "type": "function"}]
+import manifest
+import rpc
+import snapshot
+
+# getProxyImplementation(address)
+GET_PROXY_IMPLEMENTATION_SELECTOR = '0x204e1c7a'
 
 
 def proxy_to_contract(name):
     return name.split('/')[-1]
 
 
-def main():
-    network_filename = os.path.dirname(os.path.realpath(__file__)) + '/../.openzeppelin/mainnet.json'
-    arguments = [argument for argument in sys.argv if argument[0] != '-']
-    flags = [flag for flag in sys.argv if flag[0] == '-']
-    if len(arguments) > 1:
-        network_filename = arguments[-1]
-    print(f'Target filename: {network_filename}', file=sys.stderr)
-    offline = '--offline' in flags
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Update implementation addresses in the network file')
+    parser.add_argument('network_file', nargs='?', default=manifest.DEFAULT_MANIFEST)
+    parser.add_argument('--offline', action='store_true',
+                        help='do not connect to ENDPOINT, verify implementations only if --snapshot is given')
+    parser.add_argument('--snapshot',
+                        help='file with implementations registered in ProxyAdmin, ' +
+                        'updated in online mode and used for verification in offline mode')
+    parser.add_argument('--min-block', type=int,
+                        help='refresh snapshot entries read before this block, only missing ones are read by default')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true',
+                      help='send all getProxyImplementation calls as JSON-RPC batches to ENDPOINT')
+    mode.add_argument('--concurrent', action='store_true',
+                      help='send getProxyImplementation calls to ENDPOINT concurrently')
+    parser.add_argument('--concurrency', type=int, default=rpc.DEFAULT_CONCURRENCY,
+                        help='maximum number of requests in flight in concurrent mode')
+    parser.add_argument('--retries', type=int, default=rpc.DEFAULT_RETRIES,
+                        help='number of retries of a failed call in concurrent mode')
+    parser.add_argument('--timeout', type=float, default=rpc.DEFAULT_TIMEOUT,
+                        help='timeout of a single call in seconds in concurrent mode')
+    parser.add_argument('--pool-size', type=int, default=rpc.DEFAULT_POOL_SIZE,
+                        help='maximum number of open connections to ENDPOINT')
+    rpc.add_arguments(parser)
+    return parser.parse_args()
+
+
+def get_proxies(network):
+    '''Returns (name, address) of every proxy, proxies of current format manifests are named by address'''
+    if manifest.is_manifest(network):
+        return [(proxy['address'], proxy['address']) for proxy in network['proxies']]
+    proxies = []
+    for proxy_name in network['proxies'].keys():
+        if len(network['proxies'][proxy_name]) != 1:
+            raise ValueError('Multiple instances of the same contract were found')
+        proxies.append((proxy_name, network['proxies'][proxy_name][0]['address']))
+    return proxies
+
+
+def get_proxy_admin_address(network):
+    return network['admin']['address'] if manifest.is_manifest(network) else network['proxyAdmin']['address']
+
+
+def verify_implementations(network, registered_implementations):
+    '''Checks implementations registered in ProxyAdmin, given by proxy address, against the network file.
+
+    Returns a list with a dict for every proxy, it has an error message if the implementation is wrong.
+    '''
+    checks = []
+    if manifest.is_manifest(network):
+        # Current manifests do not store implementations of proxies, so any impl of the manifest is accepted
+        # layouts are not interned, the network stays as loaded and only one name per proxy is read from it
+        index = manifest.ManifestIndex(network)
+        for proxy in network['proxies']:
+            implementation = registered_implementations[proxy['address']]
+            check = {'proxy': proxy['address'], 'address': proxy['address'], 'implementation': implementation}
+            found = index.find_impl(implementation)
+            if found is None:
+                check['error'] = f'Implementation of proxy {proxy["address"]} in ProxyAdmin ({implementation})' + \
+                    ' is not found in the manifest'
+            else:
+                storage = found[1]['layout']['storage']
+                check['contract'] = storage[-1]['contract'] if storage else None
+            checks.append(check)
+        return checks
+
+    for proxy_name, proxy_address in get_proxies(network):
+        contract_name = proxy_to_contract(proxy_name)
+        registered_implementation = registered_implementations[proxy_address]
+        check = {
+            'proxy': proxy_name,
+            'address': proxy_address,
+            'implementation': registered_implementation,
+            'contract': contract_name
+        }
+        if contract_name not in network['contracts']:
+            check['error'] = f'Deployed implementation for {contract_name} is not found in the network file'
+            checks.append(check)
+            continue
+        deployed_implementation = network['contracts'][contract_name]['address']
+        if registered_implementation.lower() != deployed_implementation.lower():
+            check['error'] = f'Deployed implementation for {contract_name} ({deployed_implementation})' + \
+                f' does not match to value in ProxyAdmin ({registered_implementation})'
+        checks.append(check)
+    return checks
+
+
+def get_proxy_implementation_calls(proxy_admin_address, proxy_addresses, block):
+    return [('eth_call', [{
+        'to': proxy_admin_address,
+        'data': GET_PROXY_IMPLEMENTATION_SELECTOR + rpc.encode_address(proxy_address)
+    }, rpc.to_block_parameter(block)]) for proxy_address in proxy_addresses]
+
+
+def get_registered_implementations(args, proxy_admin_address, proxy_addresses):
+    if args.offline:
+        registered = snapshot.load(args.snapshot)
+        snapshot.check(registered, None, proxy_admin_address)
+        print(f'Reading implementations from snapshot {args.snapshot}', file=sys.stderr)
+        return snapshot.get_implementations(registered, proxy_addresses)
+
+    endpoint = rpc.get_endpoint()
+    metrics = rpc.RequestMetrics() if args.metrics else None
+    if args.batch:
+        client = rpc.JsonRpcClient(endpoint, args.batch_size, pool_size=args.pool_size, metrics=metrics)
+    elif args.concurrent:
+        client = rpc.JsonRpcClient(endpoint, timeout=args.timeout, pool_size=args.pool_size, metrics=metrics)
+    else:
+        # calls are sent one by one
+        client = rpc.JsonRpcClient(endpoint, 1, pool_size=args.pool_size, metrics=metrics)
+
+    if args.concurrent:
+        def fetch(calls):
+            return rpc.concurrent_calls(client, calls, args.concurrency, args.retries)
+    else:
+        fetch = client.batch
+
+    registered = None
+    if args.snapshot:
+        chain_id = rpc.get_chain_id(client)
+        if os.path.exists(args.snapshot):
+            registered = snapshot.load(args.snapshot)
+            snapshot.check(registered, chain_id, proxy_admin_address)
+        else:
+            registered = snapshot.create(chain_id, proxy_admin_address)
+        stale_addresses = snapshot.get_stale(registered, proxy_addresses, args.min_block)
+        print(f'{len(proxy_addresses) - len(stale_addresses)} of {len(proxy_addresses)} implementations ' +
+              'were taken from snapshot', file=sys.stderr)
+    else:
+        stale_addresses = proxy_addresses
+
+    results = []
+    if stale_addresses:
+        block = args.block if args.block is not None else rpc.get_block_number(client)
+        print(f'Reading state at block {block}', file=sys.stderr)
+        calls = get_proxy_implementation_calls(proxy_admin_address, stale_addresses, block)
+        cache = rpc.open_response_cache(args, client)
+        if cache is None:
+            results = fetch(calls)
+        else:
+            results = cache.fetch(calls, fetch)
+            cache.save()
+            print(f'{cache.hits} of {len(calls)} calls were taken from cache', file=sys.stderr)
+    implementations = [rpc.decode_address(result) for result in results]
+    if metrics is not None:
+        for line in metrics.report():
+            print(line, file=sys.stderr)
+
+    if registered is None:
+        return implementations
+    if stale_addresses:
+        snapshot.update(registered, block, dict(zip(stale_addresses, implementations)))
+        snapshot.save(args.snapshot, registered)
+    return snapshot.get_implementations(registered, proxy_addresses)
 
-    if not offline:
-        ENDPOINT = os.environ.get('ENDPOINT')
-        if ENDPOINT:
-            os.environ['WEB3_PROVIDER_URI'] = ENDPOINT
 
-        from web3.auto import w3
+def main():
+    args = parse_arguments()
+    network_filename = args.network_file
+    print(f'Target filename: {network_filename}', file=sys.stderr)
+    verify = not args.offline or args.snapshot is not None
 
     with open(network_filename) as network_f:
         network = json.load(network_f)
 
-        if not offline:
-            proxy_admin = w3.eth.contract(
-                address=network['proxyAdmin']['address'],
-                abi=PROXY_ADMIN_ABI)
-
-        for proxy_name in network['proxies'].keys():
-            contract_name = proxy_to_contract(proxy_name)
-
-            if len(network['proxies'][proxy_name]) != 1:
-                raise ValueError('Multiple instances of the same contract were found')
-
-            proxy_address = network['proxies'][proxy_name][0]['address']
+        proxies = get_proxies(network)
+        if verify:
+            proxy_addresses = [proxy_address for _, proxy_address in proxies]
+            implementations = get_registered_implementations(args, get_proxy_admin_address(network), proxy_addresses)
+            for check in verify_implementations(network, dict(zip(proxy_addresses, implementations))):
+                if 'error' in check:
+                    raise ValueError(check['error'])
+                if manifest.is_manifest(network):
+                    print(f'Proxy {check["address"]} points to {check["contract"]} at {check["implementation"]}',
+                          file=sys.stderr)
+
+        if manifest.is_manifest(network):
+            # There is nothing to update in current format manifests
+            network_f.seek(0)
+            sys.stdout.write(network_f.read())
+            return
+
+        for proxy_name, proxy_address in proxies:
             current_implementation = network['proxies'][proxy_name][0]['implementation']
-            deployed_implementation = network['contracts'][contract_name]['address']
-
-            updated_implementation = deployed_implementation
-
-            if not offline:
-                registered_implementation = proxy_admin.functions.getProxyImplementation(proxy_address).call()
-                if registered_implementation != deployed_implementation:
-                    raise ValueError(f'Deployed implementation for {contract_name} ({deployed_implementation})' +
-                                     f' does not match to value in ProxyAdmin ({registered_implementation})')
+            updated_implementation = network['contracts'][proxy_to_contract(proxy_name)]['address']
 
             if current_implementation != updated_implementation:
                 print(f'Update implementation of {proxy_name} from {current_implementation} to {updated_implementation}',
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+'''The script rebuilds implementation history of proxies from Upgraded and AdminChanged events
+
+Logs are read with eth_getLogs over block ranges that are halved when the provider refuses a range
+or returns as many logs as it is allowed to, and doubled after successful requests.
+Logs and the last scanned block of every proxy are kept in an SQLite database,
+so next runs only read blocks after the last scanned one. The database is named by chain id
+and genesis block hash, so a restarted local node with the same chain id is scanned from scratch.
+'''
+
+# cspell:words sqlite executescript executemany fetchone
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import cache
+import manifest
+import rpc
+
+DEFAULT_CACHE_DIR = cache.get_cache_dir('logs')
+DEFAULT_CONFIRMATIONS = 12
+INITIAL_RANGE = 10000
+MAX_RANGE = 1000000
+
+UPGRADED_TOPIC = '0xbc7cd75a20ee27fd9adebab32041f755214dbc6bffa90cc0225b39da2e5c2d3b'
+ADMIN_CHANGED_TOPIC = '0x7e644d79422f17c01e4894b5f4f588d331ebfa28653d42ae832dc59e38c9798f'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS logs (
+    address TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    transaction_hash TEXT NOT NULL,
+    topics TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (block, log_index)
+);
+CREATE INDEX IF NOT EXISTS logs_by_address ON logs (address, block, log_index);
+CREATE TABLE IF NOT EXISTS scanned (
+    address TEXT PRIMARY KEY,
+    block INTEGER NOT NULL
+);
+'''
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', nargs='?', default=manifest.DEFAULT_MANIFEST)
+    parser.add_argument('--proxy', action='append', default=[],
+                        help='address of a proxy to read in addition to proxies of the manifest')
+    parser.add_argument('--from-block', type=int, default=0,
+                        help='block to start from for proxies that were never scanned, e.g. the deployment block')
+    parser.add_argument('--confirmations', type=int, default=DEFAULT_CONFIRMATIONS,
+                        help='number of latest blocks that are not scanned yet because they may be reorganized')
+    parser.add_argument('--max-results', type=int,
+                        help='number of logs the provider returns at most, a range with that many logs is split')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='directory of the SQLite databases')
+    return parser.parse_args()
+
+
+class LogCache:
+    '''SQLite database of logs and the last scanned block of every address'''
+
+    def __init__(self, filename):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(SCHEMA)
+
+    def get_scanned(self, address):
+        row = self.db.execute('SELECT block FROM scanned WHERE address = ?', (address,)).fetchone()
+        return row[0] if row is not None else None
+
+    def add(self, addresses, block, logs):
+        '''Stores logs and marks addresses as scanned up to block in one transaction'''
+        with self.db:
+            self.db.executemany('INSERT OR IGNORE INTO logs VALUES (?, ?, ?, ?, ?, ?)', [(
+                log['address'].lower(),
+                int(log['blockNumber'], 16),
+                int(log['logIndex'], 16),
+                log['transactionHash'],
+                json.dumps(log['topics']),
+                log['data']
+            ) for log in logs])
+            self.db.executemany('INSERT OR REPLACE INTO scanned VALUES (?, ?)',
+                                [(address, block) for address in addresses])
+
+    def get_logs(self, address):
+        return [{'block': block, 'logIndex': log_index, 'transactionHash': transaction_hash,
+                 'topics': json.loads(topics), 'data': data}
+                for block, log_index, transaction_hash, topics, data in self.db.execute(
+                    'SELECT block, log_index, transaction_hash, topics, data FROM logs ' +
+                    'WHERE address = ? ORDER BY block, log_index', (address,))]
+
+    def close(self):
+        self.db.close()
+
+
+def get_logs(client, log_filter, start, end, max_results=None):
+    '''Yields (last block, logs) for consecutive ranges covering start..end.
+
+    A range is halved if the provider fails on it or times out, or returns max_results logs, that may be truncated.
+    The range is doubled after every successful request.
+    '''
+    size = INITIAL_RANGE
+    while start <= end:
+        stop = min(end, start + size - 1)
+        try:
+            logs = client.call('eth_getLogs', [{**log_filter, 'fromBlock': hex(start), 'toBlock': hex(stop)}])
+        except (rpc.RpcError, OSError):
+            # Providers often time out on large ranges instead of refusing them
+            if stop == start:
+                raise
+            size = (stop - start + 1) // 2
+            continue
+        if max_results is not None and len(logs) >= max_results and stop > start:
+            size = (stop - start + 1) // 2
+            continue
+        yield stop, logs
+        start = stop + 1
+        size = min(size * 2, MAX_RANGE)
+
+
+def decode_event(log, index):
+    topics = log['topics']
+    event = {'block': log['block'], 'transactionHash': log['transactionHash']}
+    if topics[0] == UPGRADED_TOPIC:
+        implementation = '0x' + topics[1][-40:]
+        found = index.find_impl(implementation)
+        event.update({'event': 'Upgraded', 'implementation': implementation})
+        if found is not None:
+            event['contract'] = manifest.get_layout_contract(found[1]['layout'])
+    else:
+        data = log['data'][2:]
+        event.update({
+            'event': 'AdminChanged',
+            'previousAdmin': '0x' + data[24:64],
+            'newAdmin': '0x' + data[88:128]
+        })
+    return event
+
+
+def main():
+    args = parse_arguments()
+    data = manifest.load(args.manifest)
+    index = manifest.ManifestIndex(data)
+    addresses = list(dict.fromkeys(address.lower()
+                                   for address in [proxy['address'] for proxy in data['proxies']] + args.proxy))
+
+    client = rpc.JsonRpcClient(rpc.get_endpoint())
+    chain_id = rpc.get_chain_id(client)
+    genesis_hash = rpc.get_block_hash(client, 0)
+    head = rpc.get_block_number(client) - args.confirmations
+    log_cache = LogCache(os.path.join(args.cache_dir, f'{chain_id}-{genesis_hash[2:]}.sqlite'))
+
+    # Proxies scanned up to the same block are read together
+    groups = {}
+    for address in addresses:
+        scanned = log_cache.get_scanned(address)
+        groups.setdefault(args.from_block if scanned is None else scanned + 1, []).append(address)
+    ranges = 0
+    for start, group in sorted(groups.items()):
+        if start > head:
+            continue
+        print(f'Reading logs of {len(group)} proxies from block {start} to {head}', file=sys.stderr)
+        log_filter = {'address': group, 'topics': [[UPGRADED_TOPIC, ADMIN_CHANGED_TOPIC]]}
+        for stop, logs in get_logs(client, log_filter, start, head, args.max_results):
+            ranges += 1
+            log_cache.add(group, stop, logs)
+    print(f'Logs of {ranges} block ranges were read', file=sys.stderr)
+
+    history = {address: [decode_event(log, index) for log in log_cache.get_logs(address)] for address in addresses}
+    log_cache.close()
+    print(json.dumps(history, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+'''The script verifies code deployed at addresses of impls from the manifest
+
+Code of all impls is read with batched eth_getCode calls at a pinned block and hashed without metadata.
+Manifest keys are hashes of creation bytecode, they can't be compared with deployed code directly.
+If build artifacts are given, manifest keys are matched with artifacts by hashes of their creation bytecode
+and deployed code is compared with deployedBytecode of the matching artifact.
+Impls of older builds have no matching artifact, for them the script only checks that they have code.
+Creation bytecode of contracts using external libraries, e.g. SkaleDKG, has link placeholders in artifacts
+while manifest keys are hashes of linked bytecode, so such impls are reported as needing linking
+and only checked to have code as well.
+'''
+
+# cspell:words impls keccak chunksize
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+import manifest
+import rpc
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', nargs='?', default=manifest.DEFAULT_MANIFEST)
+    parser.add_argument('--build-dir', help='directory with hardhat artifacts, e.g. artifacts/contracts')
+    rpc.add_arguments(parser)
+    parser.add_argument('--jobs', type=int, default=1, help='number of processes hashing code')
+    return parser.parse_args()
+
+
+def trim_metadata(code):
+    '''Removes CBOR encoded metadata, its length is stored in the last 2 bytes'''
+    if len(code) < 2:
+        return code
+    length = int.from_bytes(code[-2:], 'big') + 2
+    return code[:-length] if length < len(code) else code
+
+
+def get_code_hash(code):
+    '''Returns keccak256 of hex encoded code without metadata, as OpenZeppelin computes manifest keys'''
+    from eth_utils import keccak
+
+    return keccak(trim_metadata(bytes.fromhex(code[2:] if code.startswith('0x') else code))).hex()
+
+
+def hash_codes(codes, jobs):
+    if jobs > 1 and len(codes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(get_code_hash, codes, chunksize=16))
+    return [get_code_hash(code) for code in codes]
+
+
+def needs_linking(code, link_references):
+    return bool(link_references) or '__$' in code
+
+
+def load_artifacts(build_dir, jobs):
+    '''Returns ({creation bytecode hash: (contract name, deployed bytecode hash or None if it needs linking)},
+    set of names of contracts whose creation bytecode needs linking)'''
+    names = []
+    creation_codes = []
+    deployed_codes = []
+    unlinked = set()
+    for filename in sorted(glob.glob(os.path.join(build_dir, '**', '*.json'), recursive=True)):
+        if filename.endswith('.dbg.json'):
+            continue
+        with open(filename) as artifact_file:
+            artifact = json.load(artifact_file)
+        if not isinstance(artifact, dict) or artifact.get('bytecode', '0x') == '0x':
+            continue
+        if needs_linking(artifact['bytecode'], artifact.get('linkReferences')):
+            unlinked.add(artifact['contractName'])
+            continue
+        names.append(artifact['contractName'])
+        creation_codes.append(artifact['bytecode'])
+        deployed_code = artifact['deployedBytecode']
+        deployed_codes.append(None if needs_linking(deployed_code, artifact.get('deployedLinkReferences'))
+                              else deployed_code)
+    hashes = iter(hash_codes(creation_codes + [code for code in deployed_codes if code is not None], jobs))
+    creation_hashes = [next(hashes) for _ in creation_codes]
+    artifacts = {creation_hash: (name, next(hashes) if deployed_code is not None else None)
+                 for name, creation_hash, deployed_code in zip(names, creation_hashes, deployed_codes)}
+    return artifacts, unlinked
+
+
+def verify_impl(impl, code_hash, expected, unlinked=()):
+    '''Returns a report about one impl, it has an error message if the code is wrong'''
+    report = {'address': impl['address'], 'contract': manifest.get_layout_contract(impl['layout'])}
+    if code_hash is None:
+        return {**report, 'error': 'No code at the address'}
+    report['codeHash'] = code_hash
+    if expected is None:
+        if report['contract'] in unlinked:
+            report['warning'] = f'Artifact of {report["contract"]} needs linking, only presence of code is checked'
+        return report
+    name, deployed_hash = expected
+    report['artifact'] = name
+    if deployed_hash is not None and deployed_hash != code_hash:
+        report['error'] = f'Deployed code does not match deployedBytecode of {name}'
+    return report
+
+
+def main():
+    args = parse_arguments()
+    data = manifest.load(args.manifest)
+    impls = data['impls']
+    artifacts, unlinked = load_artifacts(args.build_dir, args.jobs) if args.build_dir else (None, set())
+
+    metrics = rpc.RequestMetrics() if args.metrics else None
+    client = rpc.JsonRpcClient(rpc.get_endpoint(), args.batch_size, metrics=metrics)
+    block = args.block if args.block is not None else rpc.get_block_number(client)
+    print(f'Reading state at block {block}', file=sys.stderr)
+    calls = [('eth_getCode', [impl['address'], hex(block)]) for impl in impls.values()]
+    cache = rpc.open_response_cache(args, client)
+    if cache is None:
+        codes = client.batch(calls)
+    else:
+        codes = cache.fetch(calls, client.batch)
+        cache.save()
+        print(f'{cache.hits} of {len(calls)} calls were taken from cache', file=sys.stderr)
+
+    deployed = [code for code in codes if code not in ('0x', '')]
+    hashes = iter(hash_codes(deployed, args.jobs))
+    reports = {}
+    for (key, impl), code in zip(impls.items(), codes):
+        code_hash = next(hashes) if code not in ('0x', '') else None
+        reports[key] = verify_impl(impl, code_hash, artifacts.get(key) if artifacts is not None else None, unlinked)
+
+    if metrics is not None:
+        for line in metrics.report():
+            print(line, file=sys.stderr)
+
+    failed = sum(1 for report in reports.values() if 'error' in report)
+    print(f'{len(reports) - failed} of {len(reports)} impls are verified', file=sys.stderr)
+    needs_link = sum(1 for report in reports.values() if 'warning' in report)
+    if needs_link:
+        print(f'{needs_link} impls need linked artifacts to compare code', file=sys.stderr)
+    print(json.dumps({'block': block, 'impls': reports}, indent=4))
+    if failed:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+'''The script verifies implementations registered in ProxyAdmin on several networks concurrently
+
+Networks are given as a JSON file with a list of {"name": ..., "manifest": ..., "endpoint": ...}
+objects or with --network options. Manifests may be in any format update_implementation_addresses.py accepts.
+Networks with the same endpoint share a client and its connection pool.
+The report is written as JSON to stdout.
+'''
+
+import argparse
+import json
+import sys
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import rpc
+import update_implementation_addresses as updater
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('networks_file', nargs='?', help='JSON file with a list of networks')
+    parser.add_argument('--network', nargs=2, action='append', default=[], metavar=('MANIFEST', 'ENDPOINT'),
+                        help='network to verify, may be repeated')
+    parser.add_argument('--jobs', type=int, default=8, help='number of networks verified at the same time')
+    parser.add_argument('--batch-size', type=int, default=rpc.DEFAULT_BATCH_SIZE,
+                        help='maximum number of calls in one batch, reduced automatically if the provider refuses it')
+    parser.add_argument('--pool-size', type=int, default=rpc.DEFAULT_POOL_SIZE,
+                        help='maximum number of open connections to every endpoint')
+    parser.add_argument('--timeout', type=float, default=30, help='timeout of a request in seconds')
+    parser.add_argument('--metrics', action='store_true', help='add RPC metrics of every method to the report')
+    args = parser.parse_args()
+    if args.networks_file is None and not args.network:
+        parser.error('no networks to verify')
+    return args
+
+
+def get_networks(args):
+    networks = []
+    if args.networks_file is not None:
+        with open(args.networks_file) as networks_file:
+            networks.extend(json.load(networks_file))
+    networks.extend({'manifest': manifest, 'endpoint': endpoint} for manifest, endpoint in args.network)
+    return networks
+
+
+def redact_endpoint(endpoint):
+    '''Strips credentials, path and query from the endpoint, providers often keep API keys there'''
+    url = urllib.parse.urlsplit(endpoint)
+    netloc = url.hostname + (f':{url.port}' if url.port is not None else '')
+    return urllib.parse.urlunsplit((url.scheme, netloc, '', '', ''))
+
+
+def verify_network(network, client):
+    with open(network['manifest']) as manifest_file:
+        data = json.load(manifest_file)
+    proxy_addresses = [proxy_address for _, proxy_address in updater.get_proxies(data)]
+    chain_id = rpc.get_chain_id(client)
+    block = rpc.get_block_number(client)
+    calls = updater.get_proxy_implementation_calls(updater.get_proxy_admin_address(data), proxy_addresses, block)
+    implementations = [rpc.decode_address(result) for result in client.batch(calls)]
+    checks = updater.verify_implementations(data, dict(zip(proxy_addresses, implementations)))
+    return {
+        'chainId': chain_id,
+        'block': block,
+        'ok': all('error' not in check for check in checks),
+        'proxies': checks
+    }
+
+
+def main():
+    args = parse_arguments()
+    networks = get_networks(args)
+    metrics = rpc.RequestMetrics() if args.metrics else None
+    clients = {}
+    for network in networks:
+        if network['endpoint'] not in clients:
+            clients[network['endpoint']] = rpc.JsonRpcClient(
+                network['endpoint'], args.batch_size, args.timeout, args.pool_size, metrics)
+
+    def verify(network):
+        report = {
+            'name': network.get('name', network['manifest']),
+            'manifest': network['manifest'],
+            'endpoint': redact_endpoint(network['endpoint'])
+        }
+        try:
+            report.update(verify_network(network, clients[network['endpoint']]))
+        except (OSError, ValueError, KeyError, rpc.RpcError) as e:
+            report.update({'ok': False, 'error': f'{type(e).__name__}: {e}'})
+        print(f'{report["name"]}: {"ok" if report["ok"] else "failed"}', file=sys.stderr)
+        return report
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        reports = list(executor.map(verify, networks))
+    result = {'ok': all(report['ok'] for report in reports), 'networks': reports}
+    if metrics is not None:
+        result['metrics'] = metrics.methods
+    print(json.dumps(result, indent=4))
+    if not result['ok']:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()